@@ -1,63 +1,83 @@
+"""Detección de responsable y fecha límite con el NER de spaCy.
+
+spaCy se importa la primera vez que se usa, para que importar este módulo
+(p. ej. al arrancar la app) no cueste varios segundos. Las fechas de las
+entidades DATE se interpretan con `fechas.interpretar_fecha`.
+"""
+
 from __future__ import annotations
 
-from typing import Any, Dict, Optional
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 from datetime import datetime
 
-try:
-    import spacy
-except Exception:
-    spacy = None
+from analyzer import buscar_asunto, escanear_texto
+from fechas import interpretar_fecha
+from metricas import instrumentar  # tiempos por etapa
+
+# Versión del análisis con IA (se usa como parte de la clave de caché)
+VERSION_IA = "ia-3"
 
-from dateutil import parser
-from analyzer import convertir_fecha
+# Caracteres alrededor de cada palabra guía ("hasta", "encargado", "asunto"...)
+# que se pasan al NER en el modo por ventanas
+VENTANA_ANTES = 80
+VENTANA_DESPUES = 240
+
+# Solo se leen `doc.ents`: el resto de componentes del modelo no hace falta
+# (el NER de es_core_news_sm tiene su propio tok2vec)
+_COMPONENTES_EXCLUIDOS = ["parser", "tagger", "morphologizer", "attribute_ruler", "lemmatizer", "senter"]
 
 _NLP = None
+# evita cargar el modelo dos veces si la precarga y una petición coinciden
+_LOCK_NLP = threading.Lock()
 
 
 def _get_nlp():
     global _NLP
     if _NLP is not None:
         return _NLP
-    if spacy is None:
-        return None
-    try:
-        _NLP = spacy.load("es_core_news_sm")
-    except OSError:
-        return None
-    return _NLP
+    with _LOCK_NLP:
+        if _NLP is not None:
+            return _NLP
+        try:
+            import spacy
+        except Exception:
+            return None
+        try:
+            _NLP = spacy.load("es_core_news_sm", exclude=_COMPONENTES_EXCLUIDOS)
+        except OSError:
+            return None
+        return _NLP
+
+
+def precargar_modelo() -> bool:
+    """Carga el modelo de spaCy por adelantado; devuelve False si no está instalado."""
+    return _get_nlp() is not None
 
 
 def _parse_date(text: str) -> Optional[datetime]:
-    cleaned = text.strip().lower()
-    try:
-        return convertir_fecha(cleaned)
-    except Exception:
-        pass
-
-    try:
-        return parser.parse(cleaned, dayfirst=True, fuzzy=True)
-    except Exception:
-        return None
+    # la entidad puede traer palabras alrededor ("el lunes 12 de marzo"): se busca la fecha dentro
+    return interpretar_fecha(text.strip())
 
 
-def extraer_entidades_ia(texto: str) -> Dict[str, Any]:
-    nlp = _get_nlp()
-    if nlp is None:
-        return {
-            "error": "missing_model",
-            "responsable": None,
-            "fecha_limite": None,
-        }
+def _sin_modelo() -> Dict[str, Any]:
+    return {
+        "error": "missing_model",
+        "responsable": None,
+        "fecha_limite": None,
+    }
+
 
-    doc = nlp(texto)
+def _elegir_entidades(entidades: Iterable[Tuple[str, str]]) -> Dict[str, Any]:
+    """Toma la primera persona y la primera fecha interpretable de (etiqueta, texto)."""
     responsable = None
     fecha_limite = None
 
-    for ent in doc.ents:
-        if responsable is None and ent.label_ in ("PER", "PERSON"):
-            responsable = ent.text.strip()
-        if fecha_limite is None and ent.label_ == "DATE":
-            fecha_limite = _parse_date(ent.text)
+    for etiqueta, texto in entidades:
+        if responsable is None and etiqueta in ("PER", "PERSON"):
+            responsable = texto.strip()
+        if fecha_limite is None and etiqueta == "DATE":
+            fecha_limite = _parse_date(texto)
         if responsable and fecha_limite:
             break
 
@@ -65,3 +85,109 @@ def extraer_entidades_ia(texto: str) -> Dict[str, Any]:
         "responsable": responsable,
         "fecha_limite": fecha_limite,
     }
+
+
+def _ajustar_a_espacio(texto: str, pos: int, hacia_atras: bool) -> int:
+    # muevo el borde de la ventana hasta un espacio para no cortar palabras
+    if hacia_atras:
+        espacio = texto.rfind(" ", 0, pos)
+        return 0 if espacio < 0 else espacio + 1
+    espacio = texto.find(" ", pos)
+    return len(texto) if espacio < 0 else espacio
+
+
+def ventanas_de_texto(texto: str) -> Optional[List[Tuple[int, int]]]:
+    """Devuelve los tramos (inicio, fin) del texto alrededor de las palabras guía.
+
+    Los tramos que se solapan se unen. Devuelve None si no hay ninguna palabra
+    guía (o si las posiciones del escaneo no son fiables), y entonces se debe
+    analizar el texto completo.
+    """
+    if len(texto.lower()) != len(texto):
+        return None  # el escaneo trabaja sobre lower(): sus posiciones no coincidirían
+    escaneo = escanear_texto(texto)
+    guias = sorted(escaneo.indices_clave + escaneo.indices_encargado + escaneo.indices_asunto)
+    if not guias:
+        return None
+
+    ventanas = []
+    for pos in guias:
+        inicio = _ajustar_a_espacio(texto, max(pos - VENTANA_ANTES, 0), hacia_atras=True)
+        fin = _ajustar_a_espacio(texto, min(pos + VENTANA_DESPUES, len(texto)), hacia_atras=False)
+        if ventanas and inicio <= ventanas[-1][1]:
+            ventanas[-1] = (ventanas[-1][0], max(ventanas[-1][1], fin))
+        else:
+            ventanas.append((inicio, fin))
+    return ventanas
+
+
+def _entidades_en_ventanas(docs, ventanas) -> Dict[str, Any]:
+    """Une las entidades de cada ventana en orden de aparición en el documento."""
+    entidades = []
+    for doc, (inicio, _) in zip(docs, ventanas):
+        for ent in doc.ents:
+            entidades.append((inicio + ent.start_char, ent.label_, ent.text))
+    entidades.sort(key=lambda e: e[0])
+    return _elegir_entidades((etiqueta, texto) for _, etiqueta, texto in entidades)
+
+
+@instrumentar("extraer_entidades_ia")
+def extraer_entidades_ia(texto: str, por_ventanas: bool = True) -> Dict[str, Any]:
+    """Detecta responsable y fecha límite con el NER de spaCy.
+
+    Con `por_ventanas` solo se analiza el texto cercano a las palabras guía
+    (ver `ventanas_de_texto`); si no hay ninguna se usa el texto completo.
+    """
+    return _extraer_entidades([texto], 1, 1, por_ventanas)[0]
+
+
+@instrumentar("extraer_entidades_ia_lote")
+def extraer_entidades_ia_lote(
+    textos: Iterable[str],
+    batch_size: int = 32,
+    n_process: int = 1,
+    por_ventanas: bool = True,
+) -> List[Dict[str, Any]]:
+    """Como `extraer_entidades_ia` pero para varios textos con `nlp.pipe`.
+
+    Devuelve los resultados en el mismo orden que `textos`. `n_process` > 1
+    reparte los lotes entre procesos (cada uno carga su copia del modelo).
+    Las ventanas de todos los textos van en la misma llamada a `nlp.pipe`.
+    """
+    return _extraer_entidades(list(textos), batch_size, n_process, por_ventanas)
+
+
+def _extraer_entidades(textos, batch_size, n_process, por_ventanas) -> List[Dict[str, Any]]:
+    nlp = _get_nlp()
+    if nlp is None:
+        return [_sin_modelo() for _ in textos]
+
+    # cada texto se divide en tramos; sin ventanas, un único tramo completo
+    tramos_por_texto = []
+    fragmentos = []
+    for texto in textos:
+        ventanas = ventanas_de_texto(texto) if por_ventanas else None
+        if ventanas is None:
+            ventanas = [(0, len(texto))]
+        tramos_por_texto.append(ventanas)
+        fragmentos.extend(texto[inicio:fin] for inicio, fin in ventanas)
+
+    docs = iter(nlp.pipe(fragmentos, batch_size=batch_size, n_process=n_process))
+    resultados = []
+    for ventanas in tramos_por_texto:
+        docs_texto = [next(docs) for _ in ventanas]
+        resultados.append(_entidades_en_ventanas(docs_texto, ventanas))
+    return resultados
+
+
+def analizar_documento_ia(texto: str) -> Dict[str, Any]:
+    """Combina el asunto (regla) con las entidades detectadas por spaCy."""
+    ia_info = extraer_entidades_ia(texto)
+    resultado = {
+        "asunto": buscar_asunto(texto),
+        "responsable": ia_info.get("responsable"),
+        "fecha_detectada": ia_info.get("fecha_limite"),
+    }
+    if ia_info.get("error"):
+        resultado["error"] = ia_info["error"]
+    return resultado
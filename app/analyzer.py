@@ -1,5 +1,15 @@
+import heapq  # selección de los N mejores candidatos
+import os  # configuración por variables de entorno
 import re  # módulo para operaciones con expresiones regulares
+import time  # presupuesto de tiempo del escaneo
+from bisect import bisect_right  # búsqueda binaria sobre posiciones ordenadas
+from dataclasses import dataclass  # resultado inmutable del escaneo
 from datetime import datetime, timedelta  # importo tipos de fecha y duración
+from functools import lru_cache  # memoizo el escaneo por texto
+from typing import Optional, Tuple
+
+from fechas import PATRONES_FECHA, interpretar_fecha  # fechas en español (precompiladas)
+from metricas import instrumentar  # tiempos por etapa
 
 PALABRAS_CLAVE = [  # lista de palabras/frases relevantes a buscar en documentos
     "De mi consideración",
@@ -22,118 +32,360 @@ PALABRAS_CLAVE = [  # lista de palabras/frases relevantes a buscar en documentos
 ]
 
 
-def buscar_encargado(texto: str):
-    """Busca al encargado/responsable en el texto (prioridad máxima)."""
+# PATRONES_FECHA (ver `fechas`) empiezan por uno de estos prefijos: el localizador
+# usa `\d` como inicial y el resto del prefijo va al lookahead
+_INICIOS_FECHA = {r"\d{1,2}": r"\d?", r"\d{4}": r"\d{3}"}
+
+# palabras que suelen preceder a la fecha límite
+PATRONES_CLAVE_FECHA = [
+    r"hasta",
+    r"fecha\s*l[ií]mite",
+    r"plazo",
+    r"entregar",
+    r"entrega",
+    r"a\s+mas\s+tardar",
+    r"antes\s+del",
+]
+
+# verbos que definen la acción del evento ("entrega" cubre también "entregar")
+VERBOS_ACCION = [
+    ("entrega", "Entregar"),
+    ("presentar", "Presentar"),
+]
+
+# `[^\S\n]*` (espacios sin saltos de línea) y no `\s*`: con `^\s*` cada inicio de
+# línea de un bloque de líneas en blanco lo recorría entero (tiempo cuadrático);
+# el asunto encontrado es el mismo
+_PATRON_ASUNTO = re.compile(r"^[^\S\n]*asunto\s*[:\-]\s*(.+)$", re.IGNORECASE | re.MULTILINE)
+_PATRON_ASUNTO_RESTO = re.compile(r"asunto\s*[:\-]\s*(.+)$", re.IGNORECASE | re.MULTILINE)
+_PATRON_ENCARGADO = re.compile(r"encargado[^\n]*", re.IGNORECASE)
+
+# segundos máximos de escaneo por documento; al agotarse se devuelve lo encontrado hasta ahí
+PRESUPUESTO_ESCANEO = float(os.environ.get("GESTOR_PRESUPUESTO_ANALISIS_S", "2"))
+# cada cuántas coincidencias del localizador se mira el reloj
+_COINCIDENCIAS_POR_CONTROL = 1024
+
+
+@dataclass(frozen=True)
+class Escaneo:
+    """Todo lo que las reglas necesitan del texto, obtenido en una sola pasada."""
+
+    palabras: Tuple[str, ...]  # palabras de PALABRAS_CLAVE presentes (en su orden)
+    indices_clave: Tuple[int, ...]  # posiciones (ordenadas) de palabras que anuncian la fecha límite
+    fechas: Tuple[Tuple[datetime, int], ...]  # (fecha, posición) válidas
+    primera_fecha: Optional[datetime]  # resultado equivalente a `buscar_fecha`
+    accion: str
+    encargado: Optional[str]
+    asunto: Optional[str]
+    indices_encargado: Tuple[int, ...]
+    indices_asunto: Tuple[int, ...]
+    incompleto: bool = False  # se agotó PRESUPUESTO_ESCANEO antes de recorrer todo el texto
+
+
+def _compilar_terminos():
+    """Construye el localizador combinado y la tabla de despacho por fuente.
+
+    Los patrones distintos ("fuentes") se agrupan por su primer carácter y cada
+    grupo es una alternativa del localizador: la inicial literal más un
+    lookahead con los restos capturados (``h(?=(asta)|...)``). Así `finditer`
+    solo consume un carácter y se detiene en cada posición donde empieza algún
+    término, aunque se solapen, y `lastindex` indica qué fuente ganó. Empezar
+    cada alternativa por un literal permite a `re` saltar rápido el resto del
+    texto. Para cada fuente se precalcula qué
+    términos quedan implicados en esa misma posición (literales que son prefijo
+    del ganador) y cuáles hay que verificar con `match` (patrones no literales
+    que van después en la alternancia).
+    """
+    terminos = []  # (fuente, tipo, dato)
+    for palabra in PALABRAS_CLAVE:
+        terminos.append((re.escape(palabra), "palabra", palabra))
+    for patron in PATRONES_CLAVE_FECHA:
+        terminos.append((patron, "clave", None))
+    for verbo, accion in VERBOS_ACCION:
+        terminos.append((re.escape(verbo), "accion", accion))
+    terminos.append(("encargado", "encargado", None))
+    terminos.append(("asunto", "asunto", None))
+    for orden, patron in enumerate(PATRONES_FECHA):
+        terminos.append((patron, "fecha", orden))
+
+    fuentes = {}  # fuente -> [(id, tipo, dato)]
+    for id_termino, (fuente, tipo, dato) in enumerate(terminos):
+        fuentes.setdefault(fuente, []).append((id_termino, tipo, dato))
+    # las más largas primero: ante dos fuentes en la misma posición gana la más larga
+    orden_fuentes = sorted(fuentes, key=len, reverse=True)
+
+    def literal(fuente):
+        texto_plano = re.sub(r"\\(.)", r"\1", fuente)
+        return texto_plano if re.escape(texto_plano) == fuente else None
+
+    def inicial_y_resto(fuente):
+        for inicio, resto in _INICIOS_FECHA.items():  # todas las fechas empiezan por dígitos
+            if fuente.startswith(inicio):
+                return r"\d", resto + fuente[len(inicio):]
+        return fuente[0], fuente[1:]  # el resto empieza por una letra literal
+
+    def compilar(fuente, tipos):
+        # una fecha no puede empezar en medio de un número (p. ej. "26-03-12" dentro de "2026-03-12")
+        return re.compile(r"(?<!\d)" + fuente if "fecha" in tipos else fuente)
+
+    restos_por_inicial = {}  # inicial -> [(resto, índice de grupo)]
+    despacho = [None]  # índice de grupo -> (presencia, implicados, a_verificar)
+    for k, fuente in enumerate(orden_fuentes):
+        inicial, resto = inicial_y_resto(fuente)
+        restos_por_inicial.setdefault(inicial, []).append((resto, len(despacho)))
+
+        ganador = literal(fuente)
+        presencia, implicados, a_verificar = set(), [], []
+        for otra in orden_fuentes[k:]:
+            if inicial_y_resto(otra)[0] != inicial:
+                continue
+            otra_literal = literal(otra)
+            if ganador is not None and otra_literal is not None:
+                if not ganador.startswith(otra_literal):
+                    continue  # dos literales que no son prefijo uno del otro no coinciden a la vez
+                for i, t, d in fuentes[otra]:
+                    if t in ("palabra", "accion"):
+                        presencia.add(d)  # solo importa que aparezca
+                    else:
+                        implicados.append((i, t, d, len(otra_literal)))
+            else:
+                compilado = compilar(otra, {t for _, t, _ in fuentes[otra]})
+                a_verificar.extend((i, t, d, compilado) for i, t, d in fuentes[otra])
+        despacho.append((tuple(presencia), tuple(implicados), tuple(a_verificar)))
+
+    # numero los grupos en el mismo orden en que aparecerán en el patrón
+    alternativas = []
+    numeracion = {}
+    for inicial, restos in restos_por_inicial.items():
+        grupos = []
+        for resto, indice in restos:
+            numeracion[len(numeracion) + 1] = indice
+            grupos.append(f"({resto})")
+        alternativas.append(f"{inicial}(?={'|'.join(grupos)})")
+    despacho = [None] + [despacho[numeracion[g]] for g in sorted(numeracion)]
+
+    return re.compile("|".join(alternativas)), despacho
+
+
+_LOCALIZADOR, _DESPACHO = _compilar_terminos()
+
+
+def _escanear(texto: str) -> Escaneo:
     texto_lower = texto.lower()
-    
-    # Patrones para buscar encargado
-    patrones_encargado = [
-        r"encargado[^\n]*",  # encargado seguido de info
-        r"jefe[\s\w]*\([^)]*encargado[^)]*\)",  # jefe (...Encargado)
-        r"([A-Z][a-záéíóú]+[\s\w.,]*)\s+\(encargado\)",  # Nombre (Encargado)
-    ]
-    
-    for patron in patrones_encargado:
-        match = re.search(patron, texto, re.IGNORECASE)
+    mismas_posiciones = len(texto_lower) == len(texto)
+
+    presentes = set()
+    indices_clave = []
+    fechas_por_patron = [[] for _ in PATRONES_FECHA]
+    primeras_fechas = [None] * len(PATRONES_FECHA)
+    indices_encargado = []
+    indices_asunto = []
+    fin_por_termino = {}  # emula el avance sin solapamiento de `re.finditer`
+
+    def registrar(id_termino, tipo, dato, pos, fin, match):
+        if tipo == "palabra" or tipo == "accion":
+            presentes.add(dato)
+            return
+        if pos < fin_por_termino.get(id_termino, 0):
+            return
+        fin_por_termino[id_termino] = fin
+        if tipo == "clave":
+            indices_clave.append(pos)
+        elif tipo == "encargado":
+            indices_encargado.append(pos)
+        elif tipo == "asunto":
+            indices_asunto.append(pos)
+        else:  # fecha
+            fecha = interpretar_fecha(match.group())
+            if primeras_fechas[dato] is None:
+                primeras_fechas[dato] = fecha or False  # False: la primera no era válida
+            if fecha is not None:
+                fechas_por_patron[dato].append((fecha, pos))
+
+    limite = time.perf_counter() + PRESUPUESTO_ESCANEO
+    incompleto = False
+    for numero, hit in enumerate(_LOCALIZADOR.finditer(texto_lower)):
+        if numero % _COINCIDENCIAS_POR_CONTROL == 0 and numero and time.perf_counter() > limite:
+            incompleto = True
+            break
+        presencia, implicados, a_verificar = _DESPACHO[hit.lastindex]
+        presentes.update(presencia)
+        if not implicados and not a_verificar:
+            continue  # caso más frecuente: una palabra clave sin posición relevante
+        pos = hit.start()
+        for id_termino, tipo, dato, largo in implicados:
+            registrar(id_termino, tipo, dato, pos, pos + largo, None)
+        for id_termino, tipo, dato, compilado in a_verificar:
+            match = compilado.match(texto_lower, pos)
+            if match:
+                registrar(id_termino, tipo, dato, pos, match.end(), match)
+
+    # igual que `buscar_fecha`: si la primera coincidencia de un patrón no es válida, paso al siguiente
+    primera_fecha = next((f for f in primeras_fechas if f), None)
+
+    if mismas_posiciones:
+        encargado = _encargado_desde(texto, indices_encargado)
+        asunto = _asunto_desde(texto, indices_asunto)
+    else:
+        # lower() cambió la longitud (caracteres Unicode raros): uso las regex originales
+        encargado = _buscar_encargado_regex(texto)
+        asunto = _buscar_asunto_regex(texto)
+
+    if "Entregar" in presentes:
+        accion = "Entregar"
+    elif "Presentar" in presentes:
+        accion = "Presentar"
+    else:
+        accion = "Tarea"
+
+    return Escaneo(
+        palabras=tuple(p for p in PALABRAS_CLAVE if p in presentes),
+        indices_clave=tuple(indices_clave),
+        fechas=tuple(f for grupo in fechas_por_patron for f in grupo),
+        primera_fecha=primera_fecha,
+        accion=accion,
+        encargado=encargado,
+        asunto=asunto,
+        indices_encargado=tuple(indices_encargado),
+        indices_asunto=tuple(indices_asunto),
+        incompleto=incompleto,
+    )
+
+
+@lru_cache(maxsize=32)
+def escanear_texto(texto: str) -> Escaneo:
+    """Recorre el texto normalizado una sola vez y devuelve todas las coincidencias.
+
+    El resultado se memoiza para que las funciones `buscar_*` llamadas sobre el
+    mismo texto compartan un único escaneo.
+    """
+    return _escanear(texto)
+
+
+def tiene_asunto_y_fecha(texto: str):
+    """Indica (hay asunto, hay fecha tras una palabra clave) sin pasar por la memoización.
+
+    Pensado para textos parciales, como una página suelta, que no conviene guardar
+    en la caché de `escanear_texto`.
+    """
+    escaneo = _escanear(texto)
+    hay_fecha = bool(escaneo.indices_clave) and any(
+        idx >= escaneo.indices_clave[0] for _, idx in escaneo.fechas
+    )
+    return escaneo.asunto is not None, hay_fecha
+
+
+def _encargado_desde(texto: str, indices):
+    if not indices:
+        return None
+    inicio = indices[0]
+    fin = texto.find("\n", inicio)
+    return texto[inicio:fin if fin != -1 else len(texto)].strip()
+
+
+def _asunto_desde(texto: str, indices):
+    for pos in indices:
+        # `^\s*` con MULTILINE: solo hay espacios entre un inicio de línea y "asunto"
+        j = pos - 1
+        while j >= 0 and texto[j] != "\n" and texto[j].isspace():
+            j -= 1
+        if j >= 0 and texto[j] != "\n":
+            continue
+        match = _PATRON_ASUNTO_RESTO.match(texto, pos)
         if match:
-            return match.group().strip()
-    
+            return match.group(1).strip()
+    return None
+
+
+def _buscar_encargado_regex(texto: str):
+    """Búsqueda con regex; respaldo cuando no se pueden usar las posiciones del escaneo.
+
+    Antes se probaban también "jefe ... (encargado)" y "Nombre (encargado)",
+    pero ambos contienen "encargado", así que solo se llegaba a ellos cuando
+    no podían coincidir; y con `[\s\w.,]*` seguido de un literal obligatorio
+    retrocedían en tiempo cuadrático sobre textos largos.
+    """
+    match = _PATRON_ENCARGADO.search(texto)
+    if match:
+        return match.group().strip()
+    return None
+
+
+def _buscar_asunto_regex(texto: str):
+    match = _PATRON_ASUNTO.search(texto)
+    if match:
+        return match.group(1).strip()
     return None
 
 
+def buscar_encargado(texto: str):
+    """Busca al encargado/responsable en el texto (prioridad máxima)."""
+    return escanear_texto(texto).encargado
+
+
 def buscar_palabras_clave(texto: str):
-    texto_lower = texto.lower()  # convierto todo el texto a minúsculas
+    escaneo = escanear_texto(texto)  # una sola pasada sobre el texto en minúsculas
     encontradas = []  # lista donde guardaré las palabras encontradas
     
-    # Primero busco al encargado y lo agrego con prioridad
-    encargado = buscar_encargado(texto)
-    if encargado:
-        encontradas.append(f"Encargado: {encargado}")
-
-    for palabra in PALABRAS_CLAVE:  # itero cada palabra clave
-        if palabra in texto_lower:  # si la palabra aparece en el texto
-            encontradas.append(palabra)  # la añado a la lista de encontradas
+    # Primero agrego al encargado con prioridad
+    if escaneo.encargado:
+        encontradas.append(f"Encargado: {escaneo.encargado}")
 
+    encontradas.extend(escaneo.palabras)  # palabras clave presentes, en el orden de la lista
     return encontradas  # devuelvo la lista de palabras encontradas
 
 
 def buscar_fecha(texto: str):
     """
-    Busca fechas en el texto en distintos formatos:
-    - 12/03/2026
-    - 12-03-2026
-    - 12 de marzo de 2026
+    Busca fechas en el texto en distintos formatos (ver `fechas`):
+    - 12/03/2026, 12-03-26
+    - 12 de marzo de 2026, 12 de marzo del 2026, 12 mar. 2026
+    - 2026-03-12
     """
+    return escanear_texto(texto).primera_fecha  # primera fecha válida según PATRONES_FECHA
 
-    patrones = [  # patrones regex para detectar formatos de fecha
-        r"\d{1,2}[/-]\d{1,2}[/-]\d{4}",  # dd/mm/yyyy o dd-mm-yyyy
-        r"\d{1,2}\s+de\s+[a-zA-Z]+\s+de\s+\d{4}",  # '12 de marzo de 2026'
-    ]
 
-    for patron in patrones:  # pruebo cada patrón contra el texto
-        match = re.search(patron, texto.lower())  # busco la primera coincidencia
-        if match:  # si encontré algo
-            fecha_texto = match.group()  # extraigo la cadena que coincide
-            try:
-                return convertir_fecha(fecha_texto)  # intento convertirla a datetime
-            except Exception:
-                pass  # si falla la conversión sigo probando otros patrones
+def _extraer_fechas(texto: str):
+    """Extrae todas las fechas con su posicion en el texto."""
+    return list(escanear_texto(texto).fechas)
 
-    return None  # si no se encontró ninguna fecha, devuelvo None
 
+def candidatos_fecha_limite(texto: str, top_n: int = 3):
+    """Devuelve hasta `top_n` fechas distintas precedidas por una palabra clave, de la más cercana a la más lejana.
 
-def _extraer_fechas(texto: str):
-    """Extrae todas las fechas con su posicion en el texto."""
-    fechas = []
-    patrones = [
-        r"\d{1,2}[/-]\d{1,2}[/-]\d{4}",
-        r"\d{1,2}\s+de\s+[a-zA-Z]+\s+de\s+\d{4}",
-    ]
-    for patron in patrones:
-        for match in re.finditer(patron, texto.lower()):
-            try:
-                fecha = convertir_fecha(match.group())
-                fechas.append((fecha, match.start()))
-            except Exception:
-                continue
-    return fechas
+    Cada candidato es una tupla (fecha, distancia en caracteres desde la palabra
+    clave anterior más próxima). Ante distancias iguales gana la fecha que
+    aparece antes en `_extraer_fechas`, igual que en `buscar_fecha_limite_doc`.
+    """
+    escaneo = escanear_texto(texto)
+    indices_clave = escaneo.indices_clave  # ya vienen ordenados por el escaneo
+    if not indices_clave:
+        return []
+
+    mejor_por_fecha = {}  # una misma fecha repetida cuenta una vez, con su mejor distancia
+    for orden, (fecha, idx) in enumerate(escaneo.fechas):
+        # palabra clave más cercana que no esté después de la fecha
+        i = bisect_right(indices_clave, idx) - 1
+        if i >= 0:
+            candidato = (idx - indices_clave[i], orden, fecha)
+            if fecha not in mejor_por_fecha or candidato < mejor_por_fecha[fecha]:
+                mejor_por_fecha[fecha] = candidato
+
+    # `orden` desempata sin llegar a comparar fechas
+    mejores = heapq.nsmallest(top_n, mejor_por_fecha.values())
+    return [(fecha, dist) for dist, _, fecha in mejores]
 
 
 def buscar_fecha_limite_doc(texto: str):
     """Busca la fecha limite usando palabras clave (hasta, plazo, fecha limite)."""
-    texto_lower = texto.lower()
-    fechas = _extraer_fechas(texto)
+    fechas = escanear_texto(texto).fechas
     if not fechas:
         return None
 
-    patrones_clave = [
-        r"hasta",
-        r"fecha\s*l[ií]mite",
-        r"plazo",
-        r"entregar",
-        r"entrega",
-        r"a\s+mas\s+tardar",
-        r"antes\s+del",
-    ]
-
-    indices_clave = []
-    for patron in patrones_clave:
-        for match in re.finditer(patron, texto_lower):
-            indices_clave.append(match.start())
-
-    if indices_clave:
-        # Busco la primera fecha despues de una palabra clave cercana.
-        mejor = None
-        mejor_dist = None
-        for fecha, idx in fechas:
-            for idx_clave in indices_clave:
-                if idx >= idx_clave:
-                    dist = idx - idx_clave
-                    if mejor is None or dist < mejor_dist:
-                        mejor = fecha
-                        mejor_dist = dist
-        if mejor:
-            return mejor
+    # Busco la primera fecha despues de una palabra clave cercana.
+    candidatos = candidatos_fecha_limite(texto, top_n=1)
+    if candidatos:
+        return candidatos[0][0]
 
     # Si no hay palabras clave, uso la fecha mas lejana (posible fecha limite)
     return max(f for f, _ in fechas)
@@ -141,44 +393,20 @@ def buscar_fecha_limite_doc(texto: str):
 
 def buscar_asunto(texto: str):
     """Extrae el asunto desde una linea tipo 'Asunto: ...' si existe."""
-    match = re.search(r"^\s*asunto\s*[:\-]\s*(.+)$", texto, re.IGNORECASE | re.MULTILINE)
-    if match:
-        return match.group(1).strip()
-    return None
+    return escanear_texto(texto).asunto
 
 
 def detectar_accion(texto: str):
     """Detecta la accion principal para titular el evento."""
-    texto_lower = texto.lower()
-    if "entregar" in texto_lower or "entrega" in texto_lower:
-        return "Entregar"
-    if "presentar" in texto_lower:
-        return "Presentar"
-    return "Tarea"
+    return escanear_texto(texto).accion
 
 
 def convertir_fecha(fecha_str: str):
-    fecha_str = fecha_str.strip()  # elimino espacios al inicio/final
-
-    if "/" in fecha_str or "-" in fecha_str:  # formato numérico con / o -
-        for fmt in ("%d/%m/%Y", "%d-%m-%Y"):  # posibles formatos
-            try:
-                return datetime.strptime(fecha_str, fmt)  # intento parsear
-            except ValueError:
-                continue  # si falla, pruebo el siguiente formato
-
-    meses = {  # mapeo nombres de meses a su número
-        "enero": 1, "febrero": 2, "marzo": 3, "abril": 4,
-        "mayo": 5, "junio": 6, "julio": 7, "agosto": 8,
-        "septiembre": 9, "octubre": 10, "noviembre": 11, "diciembre": 12,
-    }
-
-    partes = fecha_str.split()
-    dia = int(partes[0])
-    mes = meses.get(partes[2])
-    anio = int(partes[4])
-
-    return datetime(anio, mes, dia)  # construyo y devuelvo el objeto datetime
+    """Convierte el texto de una fecha en datetime; ValueError si no es una fecha válida."""
+    fecha = interpretar_fecha(fecha_str.strip())
+    if fecha is None:
+        raise ValueError(f"Fecha no reconocida: {fecha_str!r}")
+    return fecha
 
 
 def calcular_fecha_limite(fecha_detectada):
@@ -193,3 +421,21 @@ def calcular_fecha_agenda(fecha_detectada):
     if fecha_detectada:
         return fecha_detectada - timedelta(days=2)
     return datetime.now() + timedelta(days=2)
+
+
+# Versión de las reglas: cámbiala cuando se modifique el análisis para invalidar la caché
+VERSION_ANALIZADOR = "reglas-3"
+
+
+@instrumentar("analizar_documento")
+def analizar_documento(texto: str):
+    """Aplica todas las reglas al texto y devuelve los resultados en un diccionario."""
+    return {
+        "palabras": buscar_palabras_clave(texto),
+        "fecha_detectada": buscar_fecha_limite_doc(texto) or buscar_fecha(texto),
+        "candidatos_fecha": candidatos_fecha_limite(texto),
+        "asunto": buscar_asunto(texto),
+        "accion": detectar_accion(texto),
+        "responsable": buscar_encargado(texto),
+        "incompleto": escanear_texto(texto).incompleto,
+    }
@@ -0,0 +1,59 @@
+"""Medición del arranque en frío de la aplicación.
+
+Se importa al principio de las páginas de Streamlit: el tiempo se cuenta desde
+ese import. Cada etapa se registra una sola vez por proceso (los reruns de
+Streamlit no la vuelven a medir) y se imprime en la consola del servidor, de
+modo que tras un reinicio del contenedor queda en los logs cuánto tardó cada
+parte. Si se define `GESTOR_ARRANQUE_JSON`, el reporte se escribe también en
+ese archivo.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+_INICIO = time.perf_counter()
+_ETAPAS: Dict[str, float] = {}  # nombre -> segundos
+_LOCK = threading.Lock()
+
+
+def _registrar(nombre: str, segundos: float):
+    with _LOCK:
+        if nombre in _ETAPAS:
+            return
+        _ETAPAS[nombre] = segundos
+    print(f"[arranque] {nombre}: {segundos:.2f} s")
+
+    ruta = os.environ.get("GESTOR_ARRANQUE_JSON")
+    if ruta:
+        try:
+            with open(ruta, "w", encoding="utf-8") as f:
+                json.dump(reporte(), f, indent=2)
+        except OSError as e:
+            print(f"Error al guardar el reporte de arranque: {e}")
+
+
+def marcar(nombre: str):
+    """Registra los segundos transcurridos desde el inicio hasta ahora (solo la primera vez)."""
+    _registrar(nombre, time.perf_counter() - _INICIO)
+
+
+@contextmanager
+def etapa(nombre: str):
+    """Mide la duración del bloque, p. ej. la carga del modelo de spaCy."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        _registrar(nombre, time.perf_counter() - inicio)
+
+
+def reporte() -> Dict[str, float]:
+    """Devuelve las etapas medidas hasta ahora, en segundos."""
+    with _LOCK:
+        return dict(_ETAPAS)
@@ -1,6 +1,5 @@
 import streamlit as st  # interfaz web ligera usada en la aplicación
-from google_auth_oauthlib.flow import Flow  # flujo OAuth2 para Google
-from googleapiclient.discovery import build  # constructor de servicios de Google API
+from google_clients import invalidar_servicios, obtener_servicio  # clientes de Google reutilizables
 import pickle
 import os
 from pathlib import Path
@@ -44,8 +43,9 @@ def cargar_credenciales():
     return None
 
 
-def eliminar_credenciales():
-    """Elimina el archivo de credenciales guardadas."""
+def eliminar_credenciales(creds=None):
+    """Elimina el archivo de credenciales guardadas y los clientes construidos con ellas."""
+    invalidar_servicios(creds)
     try:
         if os.path.exists(CREDENTIALS_FILE):
             os.remove(CREDENTIALS_FILE)
@@ -53,14 +53,21 @@ def eliminar_credenciales():
         print(f"Error al eliminar credenciales: {e}")
 
 
-def iniciar_login():
-    # creo el flujo OAuth a partir del archivo de secretos
-    flow = Flow.from_client_secrets_file(
+def _crear_flujo():
+    # el import de google_auth_oauthlib es lento: solo se paga al iniciar sesión
+    from google_auth_oauthlib.flow import Flow  # flujo OAuth2 para Google
+
+    return Flow.from_client_secrets_file(
         CLIENT_SECRETS_FILE,
         scopes=SCOPES,
         redirect_uri=REDIRECT_URI,
     )
 
+
+def iniciar_login():
+    # creo el flujo OAuth a partir del archivo de secretos
+    flow = _crear_flujo()
+
     # genero la URL de autorización que el usuario debe visitar
     auth_url, _ = flow.authorization_url(
         access_type="offline",  # solicitar refresh token
@@ -71,8 +78,8 @@ def iniciar_login():
 
 
 def obtener_usuario(creds):
-    # construyo el servicio oauth2 para obtener información del usuario
-    service = build("oauth2", "v2", credentials=creds)
+    # obtengo el servicio oauth2 (reutilizado) para obtener información del usuario
+    service = obtener_servicio(creds, "oauth2", "v2")
     user_info = service.userinfo().get().execute()  # solicito los datos del usuario
     return {
         "email": user_info.get("email"),  # correo del usuario
@@ -93,11 +100,7 @@ def procesar_callback():
 
     try:
         # recreo el flujo para intercambiar el código por credenciales
-        flow = Flow.from_client_secrets_file(
-            CLIENT_SECRETS_FILE,
-            scopes=SCOPES,
-            redirect_uri=REDIRECT_URI,
-        )
+        flow = _crear_flujo()
 
         # intento canjear el código por tokens (access + refresh)
         flow.fetch_token(code=code)
@@ -0,0 +1,237 @@
+"""Caché persistente en disco para el texto extraído y el resultado del análisis.
+
+Las entradas se indexan por el SHA-256 de los bytes del PDF y la versión del
+analizador, de modo que un mismo documento no se vuelve a procesar en cada
+rerun de Streamlit. Se usa SQLite (modo WAL) para poder compartir la caché
+entre sesiones y procesos; cuando se supera el tamaño máximo se eliminan las
+entradas usadas hace más tiempo (LRU).
+
+La misma base guarda el manifiesto de Drive: para cada archivo (id + versión
+según el listado) el hash de su contenido, lo que permite reutilizar el
+análisis sin volver a descargar un archivo que no cambió, y el registro de
+eventos de Calendar creados por hash de documento y calendario (este último no
+se borra con `limpiar_cache`: no es una caché sino lo que ya existe en Calendar).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+
+# Ruta de la base de datos de caché (configurable por variable de entorno)
+CACHE_DB = os.environ.get("GESTOR_CACHE_DB", ".cache/documentos.sqlite3")
+# Tamaño máximo aproximado de la caché en bytes
+CACHE_MAX_BYTES = int(os.environ.get("GESTOR_CACHE_MAX_MB", "256")) * 1024 * 1024
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS documentos (
+    clave TEXT PRIMARY KEY,
+    texto TEXT NOT NULL,
+    resultado TEXT NOT NULL,
+    tamano INTEGER NOT NULL,
+    ultimo_acceso REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_documentos_acceso ON documentos (ultimo_acceso);
+CREATE TABLE IF NOT EXISTS manifiesto_drive (
+    file_id TEXT PRIMARY KEY,
+    version TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    actualizado REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS eventos_calendar (
+    hash TEXT NOT NULL,
+    calendario TEXT NOT NULL,
+    evento_id TEXT NOT NULL,
+    enlace TEXT,
+    creado REAL NOT NULL,
+    PRIMARY KEY (hash, calendario)
+);
+"""
+
+
+def _conectar() -> sqlite3.Connection:
+    Path(CACHE_DB).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(CACHE_DB, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_ESQUEMA)
+    return conn
+
+
+def _codificar(valor):
+    # las fechas no son serializables en JSON: las guardo como ISO 8601 marcadas
+    if isinstance(valor, datetime):
+        return {"$fecha": valor.isoformat()}
+    raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+
+def _decodificar(obj):
+    if set(obj) == {"$fecha"}:
+        return datetime.fromisoformat(obj["$fecha"])
+    return obj
+
+
+def calcular_hash(datos: Union[bytes, str]) -> str:
+    """Devuelve el SHA-256 (hexadecimal) del contenido del PDF (bytes o ruta de archivo).
+
+    Los archivos se leen por bloques, sin cargarlos enteros en memoria.
+    """
+    if isinstance(datos, (bytes, bytearray)):
+        return hashlib.sha256(datos).hexdigest()
+    with open(datos, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def _clave(hash_pdf: str, version: str) -> str:
+    return f"{version}:{hash_pdf}"
+
+
+def leer_cache(hash_pdf: str, version: str) -> Optional[Dict[str, Any]]:
+    """Devuelve {"texto", "resultado"} si el documento ya fue analizado con esa versión."""
+    clave = _clave(hash_pdf, version)
+    try:
+        with closing(_conectar()) as conn, conn:
+            fila = conn.execute(
+                "SELECT texto, resultado FROM documentos WHERE clave = ?", (clave,)
+            ).fetchone()
+            if fila is None:
+                return None
+            # actualizo la marca de acceso para la política LRU
+            conn.execute(
+                "UPDATE documentos SET ultimo_acceso = ? WHERE clave = ?",
+                (time.time(), clave),
+            )
+    except sqlite3.Error as e:
+        print(f"Error al leer la caché: {e}")
+        return None
+
+    return {
+        "texto": fila[0],
+        "resultado": json.loads(fila[1], object_hook=_decodificar),
+    }
+
+
+def guardar_cache(hash_pdf: str, version: str, texto: str, resultado: Dict[str, Any]):
+    """Guarda el texto y el resultado del análisis, expulsando entradas antiguas si hace falta."""
+    resultado_json = json.dumps(resultado, default=_codificar, ensure_ascii=False)
+    tamano = len(texto.encode("utf-8")) + len(resultado_json.encode("utf-8"))
+    if tamano > CACHE_MAX_BYTES:
+        return  # el documento no cabe en la caché
+
+    try:
+        with closing(_conectar()) as conn, conn:
+            conn.execute("BEGIN IMMEDIATE")  # bloqueo de escritura entre procesos
+            conn.execute(
+                "INSERT OR REPLACE INTO documentos VALUES (?, ?, ?, ?, ?)",
+                (_clave(hash_pdf, version), texto, resultado_json, tamano, time.time()),
+            )
+            _expulsar(conn)
+    except sqlite3.Error as e:
+        print(f"Error al guardar en la caché: {e}")
+
+
+def _expulsar(conn: sqlite3.Connection):
+    """Elimina las entradas menos usadas hasta volver por debajo del tamaño máximo."""
+    total = conn.execute("SELECT COALESCE(SUM(tamano), 0) FROM documentos").fetchone()[0]
+    exceso = total - CACHE_MAX_BYTES
+    if exceso <= 0:
+        return
+
+    claves = []
+    for clave, tamano in conn.execute(
+        "SELECT clave, tamano FROM documentos ORDER BY ultimo_acceso"
+    ):
+        claves.append((clave,))
+        exceso -= tamano
+        if exceso <= 0:
+            break
+    conn.executemany("DELETE FROM documentos WHERE clave = ?", claves)
+
+
+def leer_manifiesto(file_id: str, version: str) -> Optional[str]:
+    """Devuelve el hash del contenido de `file_id` si se procesó en esa misma versión."""
+    try:
+        with closing(_conectar()) as conn:
+            fila = conn.execute(
+                "SELECT hash FROM manifiesto_drive WHERE file_id = ? AND version = ?",
+                (file_id, version),
+            ).fetchone()
+    except sqlite3.Error as e:
+        print(f"Error al leer el manifiesto: {e}")
+        return None
+    return fila[0] if fila else None
+
+
+def guardar_manifiesto(file_id: str, version: str, hash_pdf: str):
+    """Recuerda que la versión `version` de `file_id` tiene el contenido `hash_pdf`."""
+    try:
+        with closing(_conectar()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO manifiesto_drive VALUES (?, ?, ?, ?)",
+                (file_id, version, hash_pdf, time.time()),
+            )
+    except sqlite3.Error as e:
+        print(f"Error al guardar el manifiesto: {e}")
+
+
+def leer_eventos(hashes: Iterable[str], calendario: str) -> Dict[str, Dict[str, Any]]:
+    """Devuelve {hash: {"id", "enlace"}} de los documentos que ya tienen evento en `calendario`."""
+    hashes = list(hashes)
+    if not hashes:
+        return {}
+    try:
+        with closing(_conectar()) as conn:
+            filas = conn.execute(
+                "SELECT hash, evento_id, enlace FROM eventos_calendar "
+                f"WHERE calendario = ? AND hash IN ({', '.join('?' * len(hashes))})",
+                (calendario, *hashes),
+            ).fetchall()
+    except sqlite3.Error as e:
+        print(f"Error al leer los eventos registrados: {e}")
+        return {}
+    return {hash_pdf: {"id": evento_id, "enlace": enlace} for hash_pdf, evento_id, enlace in filas}
+
+
+def guardar_eventos(calendario: str, eventos: Iterable[Tuple[str, str, Optional[str]]]):
+    """Registra los eventos de `calendario` como tuplas (hash, id del evento, enlace)."""
+    ahora = time.time()
+    try:
+        with closing(_conectar()) as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO eventos_calendar VALUES (?, ?, ?, ?, ?)",
+                [(hash_pdf, calendario, evento_id, enlace, ahora) for hash_pdf, evento_id, enlace in eventos],
+            )
+    except sqlite3.Error as e:
+        print(f"Error al registrar los eventos: {e}")
+
+
+def borrar_eventos(calendario: str, hashes: Iterable[str]):
+    """Olvida los eventos de `calendario` de estos documentos (se borraron en Calendar)."""
+    hashes = list(hashes)
+    if not hashes:
+        return
+    try:
+        with closing(_conectar()) as conn, conn:
+            conn.execute(
+                "DELETE FROM eventos_calendar "
+                f"WHERE calendario = ? AND hash IN ({', '.join('?' * len(hashes))})",
+                (calendario, *hashes),
+            )
+    except sqlite3.Error as e:
+        print(f"Error al borrar los eventos registrados: {e}")
+
+
+def limpiar_cache():
+    """Vacía la caché por completo."""
+    try:
+        with closing(_conectar()) as conn, conn:
+            conn.execute("DELETE FROM documentos")
+            conn.execute("DELETE FROM manifiesto_drive")
+    except sqlite3.Error as e:
+        print(f"Error al limpiar la caché: {e}")
@@ -1,21 +1,43 @@
-from googleapiclient.discovery import build  # constructor de clientes para Google APIs
-from datetime import datetime, timedelta  # utilidades de fecha y duración
+from cache_documentos import borrar_eventos, guardar_eventos, leer_eventos  # registro de eventos ya creados
+from google_clients import clave_usuario, obtener_servicio  # clientes de Google reutilizables
+from metricas import instrumentar  # tiempos por etapa
+from datetime import datetime, timedelta, timezone  # utilidades de fecha y duración
 from zoneinfo import ZoneInfo  # zona horaria estándar
+import threading
+import time
 
 
-def crear_evento_calendar(
-    creds,
-    titulo,
-    descripcion,
-    fecha_limite,
-):
-    # construyo el servicio de Calendar con las credenciales proporcionadas
-    service = build("calendar", "v3", credentials=creds)
+# máximo de peticiones por lote que admite la API de Calendar
+MAX_LOTE_CALENDAR = 50
+# segundos durante los que se reutiliza la lista de próximos eventos
+TTL_EVENTOS = 60
+# días hacia atrás en los que se buscan eventos ya creados: la fecha de agenda
+# de un documento sin fecha depende del día en que se analiza
+DIAS_BUSQUEDA_MARCAS = 365
+
+# propiedades privadas con las que se marcan los eventos creados por el gestor
+PROPIEDAD_MARCA = "gestorDocumentos"
+PROPIEDAD_HASH = "gestorHash"
+
+# id del calendario principal de cada usuario
+_CALENDARIOS = {}
 
-    # inicio del evento: combino la fecha límite con la hora mínima del día
+# caché de eventos por usuario: {"eventos": {id: evento}, "sync_token", "fin_ventana", "vigente_hasta", "lock"}
+_CACHE_EVENTOS = {}
+# solo protege el diccionario; cada usuario sincroniza con su propio "lock"
+_LOCK_EVENTOS = threading.Lock()
+
+
+def _inicio_evento(fecha_limite):
+    """Inicio del evento: la fecha límite a la hora mínima del día."""
     zona = ZoneInfo("America/Guayaquil")
     fecha_base = fecha_limite.date() if isinstance(fecha_limite, datetime) else fecha_limite
-    inicio = datetime.combine(fecha_base, datetime.min.time()).replace(tzinfo=zona)
+    return datetime.combine(fecha_base, datetime.min.time()).replace(tzinfo=zona)
+
+
+def _construir_evento(titulo, descripcion, fecha_limite, hash_documento=None):
+    """Arma el cuerpo del evento que se enviará a la API de Calendar."""
+    inicio = _inicio_evento(fecha_limite)
     # duración por defecto: 1 hora
     fin = inicio + timedelta(hours=1)
 
@@ -32,36 +54,315 @@ def crear_evento_calendar(
             "timeZone": "America/Guayaquil",
         },
     }
+    if hash_documento:
+        # marca privada (solo visible para esta aplicación) para reconocer el evento después
+        evento["extendedProperties"] = {
+            "private": {PROPIEDAD_MARCA: "1", PROPIEDAD_HASH: hash_documento}
+        }
+    return evento
 
-    # inserto el evento en el calendario principal (primary)
-    evento_creado = service.events().insert(
-        calendarId="primary",
-        body=evento
-    ).execute()
 
-    # devuelvo el enlace web al evento recién creado
-    return evento_creado.get("htmlLink")
+def crear_evento_calendar(
+    creds,
+    titulo,
+    descripcion,
+    fecha_limite,
+    hash_documento=None,
+):
+    """Crea un evento y devuelve su enlace; con `hash_documento` no lo duplica si ya existe."""
+    datos = {
+        "titulo": titulo,
+        "descripcion": descripcion,
+        "fecha_limite": fecha_limite,
+        "hash_documento": hash_documento,
+    }
+    resultado = crear_eventos_calendar(creds, [(0, datos)])[0]
+    if resultado["error"]:
+        raise RuntimeError(resultado["error"])
 
+    # devuelvo el enlace web al evento
+    return resultado["enlace"]
 
-def obtener_eventos_calendar(creds, dias=30):
-    """Obtiene los próximos eventos del calendario dentro de los próximos `dias` días."""
-    service = build("calendar", "v3", credentials=creds)
-    
-    # ahora y fecha límite
-    ahora = datetime.utcnow().isoformat() + 'Z'
-    fecha_limite = (datetime.utcnow() + timedelta(days=dias)).isoformat() + 'Z'
-    
-    try:
-        # solicito los eventos del calendario en el rango de fechas
-        eventos = service.events().list(
-            calendarId='primary',
-            timeMin=ahora,
-            timeMax=fecha_limite,
+
+def _id_calendario(service, creds):
+    """Id real del calendario principal del usuario ("primary" es igual para todos)."""
+    clave = clave_usuario(creds)
+    if clave not in _CALENDARIOS:
+        try:
+            _CALENDARIOS[clave] = service.calendars().get(calendarId="primary", fields="id").execute()["id"]
+        except Exception as e:
+            print(f"Error al obtener el calendario principal: {e}")
+            return None
+    return _CALENDARIOS[clave]
+
+
+def _eventos_marcados(service, hashes, desde, hasta):
+    """Busca entre `desde` y `hasta` los eventos creados por el gestor para `hashes`.
+
+    Es una sola consulta (paginada) filtrada por `PROPIEDAD_MARCA`; el hash de
+    cada evento se compara aquí, porque la API combina con "y" los
+    `privateExtendedProperty` repetidos. Devuelve {hash: {"id", "enlace"}}.
+    """
+    hashes = set(hashes)
+    items, _ = _listar_todo(
+        service,
+        privateExtendedProperty=f"{PROPIEDAD_MARCA}=1",
+        timeMin=desde.isoformat(),
+        timeMax=hasta.isoformat(),
+        maxResults=250,
+        fields="items(id,htmlLink,extendedProperties/private),nextPageToken,nextSyncToken",
+    )
+    encontrados = {}
+    for item in items:
+        hash_documento = item.get("extendedProperties", {}).get("private", {}).get(PROPIEDAD_HASH)
+        if hash_documento in hashes and hash_documento not in encontrados:
+            encontrados[hash_documento] = {"id": item["id"], "enlace": item.get("htmlLink")}
+    return encontrados
+
+
+def _eventos_vigentes(service, registrados):
+    """De los eventos del registro local ({hash: {"id", "enlace"}}), los que siguen en el calendario.
+
+    Se piden por id en peticiones por lotes. Los borrados (404/410 o estado
+    `cancelled`) no se devuelven; ante otros errores se confía en el registro.
+    """
+    from googleapiclient.errors import HttpError  # errores HTTP de la API
+
+    hashes = list(registrados)
+    vigentes = {}
+
+    def al_responder(request_id, respuesta, error):
+        hash_documento = hashes[int(request_id)]
+        if error is None:
+            if respuesta.get("status") != "cancelled":
+                vigentes[hash_documento] = {"id": respuesta["id"], "enlace": respuesta.get("htmlLink")}
+        elif not (isinstance(error, HttpError) and error.resp.status in (404, 410)):
+            print(f"Error al comprobar el evento de {hash_documento}: {error}")
+            vigentes[hash_documento] = registrados[hash_documento]
+
+    for inicio in range(0, len(hashes), MAX_LOTE_CALENDAR):
+        lote = service.new_batch_http_request(callback=al_responder)
+        for indice in range(inicio, min(inicio + MAX_LOTE_CALENDAR, len(hashes))):
+            lote.add(
+                service.events().get(
+                    calendarId="primary",
+                    eventId=registrados[hashes[indice]]["id"],
+                    fields="id,status,htmlLink",
+                ),
+                request_id=str(indice),
+            )
+        lote.execute()
+    return vigentes
+
+
+@instrumentar("crear_eventos_calendar")
+def crear_eventos_calendar(creds, eventos, canal=0):
+    """Crea varios eventos usando peticiones por lotes (batch) de la API de Calendar.
+
+    `eventos` es una lista de (clave, datos), donde `datos` tiene `titulo`,
+    `descripcion`, `fecha_limite` y opcionalmente `hash_documento`. Devuelve
+    {clave: {"enlace": ..., "error": ..., "existente": ...}} para saber qué
+    documento originó cada evento.
+
+    Los eventos con `hash_documento` son idempotentes: si el calendario ya
+    tiene un evento con su marca privada, no se vuelve a insertar
+    (`existente`). El registro local es solo una pista: se buscan los eventos
+    marcados en la ventana del lote, se comprueban por id los registrados que
+    quedan fuera, y se olvidan los que el usuario borró en Calendar.
+
+    Desde un hilo en segundo plano hay que pasar un `canal` propio (ver
+    `google_clients.obtener_servicio`): el de la interfaz es el 0.
+    """
+    service = obtener_servicio(creds, "calendar", "v3", canal)
+    eventos = list(eventos)
+    resultados = {}
+    calendario = None
+
+    # índices de los eventos de cada documento (el mismo PDF puede llegar con dos nombres)
+    por_hash = {}
+    for indice, (_, datos) in enumerate(eventos):
+        if datos.get("hash_documento"):
+            por_hash.setdefault(datos["hash_documento"], []).append(indice)
+
+    if por_hash:
+        calendario = _id_calendario(service, creds)
+        registrados = leer_eventos(por_hash, calendario) if calendario else {}
+        inicios = [_inicio_evento(eventos[indices[0]][1]["fecha_limite"]) for indices in por_hash.values()]
+        try:
+            existentes = _eventos_marcados(
+                service,
+                por_hash,
+                min(inicios) - timedelta(days=DIAS_BUSQUEDA_MARCAS),
+                max(inicios) + timedelta(days=1),
+            )
+            fuera = {h: ev for h, ev in registrados.items() if h not in existentes}
+            if fuera:
+                existentes.update(_eventos_vigentes(service, fuera))
+        except Exception as e:
+            print(f"Error al buscar eventos ya creados: {e}")
+            existentes = registrados  # sin respuesta de Calendar, mejor no duplicar
+        else:
+            if calendario:
+                borrar_eventos(calendario, [h for h in registrados if h not in existentes])
+                guardar_eventos(
+                    calendario,
+                    [(h, ev["id"], ev["enlace"]) for h, ev in existentes.items() if registrados.get(h) != ev],
+                )
+        for hash_documento, evento in existentes.items():
+            for indice in por_hash[hash_documento]:
+                resultados[eventos[indice][0]] = {"enlace": evento["enlace"], "error": None, "existente": True}
+
+    # solo inserto los que faltan, y uno por documento
+    a_insertar = [
+        indice for indice, (clave, datos) in enumerate(eventos)
+        if clave not in resultados
+        and (not datos.get("hash_documento") or por_hash[datos["hash_documento"]][0] == indice)
+    ]
+    creados = []
+
+    def al_responder(request_id, respuesta, error):
+        clave, datos = eventos[int(request_id)]
+        if error is not None:
+            resultados[clave] = {"enlace": None, "error": str(error), "existente": False}
+        else:
+            resultados[clave] = {"enlace": respuesta.get("htmlLink"), "error": None, "existente": False}
+            if datos.get("hash_documento"):
+                creados.append((datos["hash_documento"], respuesta.get("id"), respuesta.get("htmlLink")))
+
+    # envío como mucho MAX_LOTE_CALENDAR inserciones por petición HTTP
+    for inicio in range(0, len(a_insertar), MAX_LOTE_CALENDAR):
+        indices = a_insertar[inicio:inicio + MAX_LOTE_CALENDAR]
+        lote = service.new_batch_http_request(callback=al_responder)
+        for indice in indices:
+            _, datos = eventos[indice]
+            lote.add(
+                service.events().insert(calendarId="primary", body=_construir_evento(**datos)),
+                request_id=str(indice),
+            )
+        try:
+            lote.execute()
+        except Exception as e:
+            # si falla el lote completo, marco con error los eventos que no respondieron
+            for indice in indices:
+                resultados.setdefault(eventos[indice][0], {"enlace": None, "error": str(e), "existente": False})
+
+    if creados and calendario:
+        guardar_eventos(calendario, creados)
+
+    # los demás eventos del mismo documento comparten el resultado del insertado
+    for indices in por_hash.values():
+        for indice in indices[1:]:
+            resultados.setdefault(eventos[indice][0], resultados.get(eventos[indices[0]][0]))
+
+    if a_insertar:
+        invalidar_eventos(creds)  # el panel de próximos eventos debe mostrarlos
+
+    return resultados
+
+
+def invalidar_eventos(creds):
+    """Fuerza a refrescar la lista de eventos en la siguiente consulta (sigue siendo incremental)."""
+    with _LOCK_EVENTOS:
+        estado = _CACHE_EVENTOS.get(clave_usuario(creds))
+        if estado is not None:
+            estado["vigente_hasta"] = 0
+
+
+def _instante(extremo):
+    """Convierte el `start`/`end` de un evento en datetime con zona (UTC para días completos)."""
+    if "dateTime" in extremo:
+        return datetime.fromisoformat(extremo["dateTime"].replace("Z", "+00:00"))
+    return datetime.fromisoformat(extremo["date"]).replace(tzinfo=timezone.utc)
+
+
+def _listar_todo(service, **parametros):
+    """Recorre todas las páginas de events().list y devuelve (items, nextSyncToken)."""
+    items = []
+    token_pagina = None
+    while True:
+        respuesta = service.events().list(
+            calendarId="primary",
             singleEvents=True,
-            orderBy='startTime'
+            pageToken=token_pagina,
+            **parametros,
         ).execute()
-        
-        return eventos.get('items', [])
-    except Exception as e:
-        print(f"Error al obtener eventos: {e}")
-        return []
+        items.extend(respuesta.get("items", []))
+        token_pagina = respuesta.get("nextPageToken")
+        if not token_pagina:
+            return items, respuesta.get("nextSyncToken")
+
+
+def _sincronizar(service, estado, ahora, dias):
+    """Actualiza `estado` con los cambios desde el último syncToken, o con una carga completa."""
+    from googleapiclient.errors import HttpError  # errores HTTP de la API (p. ej. 410)
+
+    fin = ahora + timedelta(days=dias)
+    if estado.get("sync_token") and fin <= estado["fin_ventana"]:
+        try:
+            cambios, sync_token = _listar_todo(service, syncToken=estado["sync_token"])
+        except HttpError as e:
+            if e.resp.status != 410:  # 410: el token caducó, hay que recargar todo
+                raise
+        else:
+            for item in cambios:
+                if item.get("status") == "cancelled":
+                    estado["eventos"].pop(item["id"], None)
+                else:
+                    estado["eventos"][item["id"]] = item
+            estado["sync_token"] = sync_token
+            return
+
+    # carga completa con margen, para que las siguientes puedan ser incrementales
+    fin_ventana = ahora + timedelta(days=dias * 2)
+    items, sync_token = _listar_todo(
+        service,
+        timeMin=ahora.isoformat(),
+        timeMax=fin_ventana.isoformat(),
+    )
+    estado["eventos"] = {item["id"]: item for item in items}
+    estado["sync_token"] = sync_token
+    estado["fin_ventana"] = fin_ventana
+
+
+@instrumentar("obtener_eventos_calendar")
+def obtener_eventos_calendar(creds, dias=30, ttl=TTL_EVENTOS):
+    """Obtiene los próximos eventos del calendario dentro de los próximos `dias` días.
+
+    El resultado se guarda por usuario durante `ttl` segundos; al caducar se
+    piden solo los cambios (syncToken) en vez de la lista completa.
+    """
+    clave = clave_usuario(creds)
+    with _LOCK_EVENTOS:
+        estado = _CACHE_EVENTOS.setdefault(
+            clave, {"eventos": {}, "vigente_hasta": 0, "lock": threading.Lock()}
+        )
+
+    # ahora y fecha límite
+    ahora = datetime.now(timezone.utc)
+    fecha_limite = ahora + timedelta(days=dias)
+
+    # la sincronización de un usuario no hace esperar a los demás
+    with estado["lock"]:
+        if time.monotonic() >= estado["vigente_hasta"]:  # otra petición pudo refrescarla ya
+            service = obtener_servicio(creds, "calendar", "v3")
+            try:
+                _sincronizar(service, estado, ahora, dias)
+                estado["vigente_hasta"] = time.monotonic() + ttl
+            except Exception as e:
+                print(f"Error al obtener eventos: {e}")
+                if not estado["eventos"]:
+                    return []
+        guardados = list(estado["eventos"].values())
+
+    # filtro la ventana pedida y ordeno por inicio (como orderBy='startTime')
+    eventos = []
+    for evento in guardados:
+        try:
+            inicio = _instante(evento["start"])
+            fin = _instante(evento["end"])
+        except (KeyError, ValueError):
+            continue
+        if fin > ahora and inicio < fecha_limite:
+            eventos.append((inicio, evento))
+    eventos.sort(key=lambda par: par[0])
+    return [evento for _, evento in eventos]
@@ -0,0 +1,130 @@
+"""Análisis por lotes desde la línea de comandos, sin Streamlit.
+
+Recorre una carpeta (recursivamente) o un patrón glob de PDFs, los pasa por el
+mismo flujo que la interfaz (`pipeline`, con el pool de procesos de `lote`) y
+escribe una línea JSON por documento en la
+salida estándar o en un archivo. Con `--salida` la ejecución se puede reanudar:
+los documentos que ya figuran sin error en el archivo no se vuelven a procesar.
+
+Uso:
+    python app/cli.py documentos/ --motor reglas --salida resultados.jsonl
+    python app/cli.py "documentos/**/*.pdf" --motor ia --workers 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import os
+import sys
+from datetime import date, datetime
+from pathlib import Path
+from typing import List, Set
+
+import metricas
+from lote import TIMEOUT_POR_DOCUMENTO
+from pipeline import DestinoIndice, FuenteArchivos, ejecutar
+from procesamiento import MOTORES
+
+
+def buscar_pdfs(origen: str) -> List[str]:
+    """Devuelve las rutas de PDF de una carpeta (recursiva) o de un patrón glob, ordenadas."""
+    if os.path.isdir(origen):
+        rutas = (str(p) for p in Path(origen).rglob("*") if p.suffix.lower() == ".pdf")
+    else:
+        rutas = (r for r in glob.glob(origen, recursive=True) if os.path.isfile(r))
+    return sorted(rutas)
+
+
+def ya_procesados(salida: Path) -> Set[str]:
+    """Rutas que ya tienen una línea sin error en `salida` (para reanudar)."""
+    hechos = set()
+    if not salida.exists():
+        return hechos
+    with open(salida, encoding="utf-8") as f:
+        for linea in f:
+            try:
+                registro = json.loads(linea)
+            except json.JSONDecodeError:
+                continue  # línea cortada por una interrupción
+            if not registro.get("error"):
+                hechos.add(registro["archivo"])
+    return hechos
+
+
+def _serializar(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("origen", help="carpeta o patrón glob (entre comillas) de PDFs")
+    parser.add_argument("--motor", choices=sorted(MOTORES), default="reglas")
+    parser.add_argument("--workers", type=int, default=None, help="procesos (por defecto uno por núcleo)")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT_POR_DOCUMENTO, help="segundos por documento")
+    parser.add_argument("--rapida", action="store_true", help="lectura rápida (parada temprana)")
+    parser.add_argument("--salida", type=Path, default=None, help="archivo JSONL (se reanuda si existe)")
+    parser.add_argument("--con-texto", action="store_true", help="incluir el texto extraído en cada línea")
+    parser.add_argument("--metricas", type=Path, default=None, help="guardar métricas en formato Prometheus")
+    parser.add_argument("--indexar", action="store_true", help="agregar los documentos al índice de búsqueda")
+    args = parser.parse_args(argv)
+
+    rutas = buscar_pdfs(args.origen)
+    if args.salida is not None:
+        hechos = ya_procesados(args.salida)
+        pendientes = [r for r in rutas if r not in hechos]
+        if hechos:
+            print(f"Reanudando: {len(rutas) - len(pendientes)} documentos ya procesados", file=sys.stderr)
+    else:
+        pendientes = rutas
+    if not pendientes:
+        print("No hay documentos por procesar", file=sys.stderr)
+        return 0
+
+    if args.metricas is not None:
+        metricas.activar()
+
+    destino = open(args.salida, "a", encoding="utf-8") if args.salida else sys.stdout
+    errores = 0
+    try:
+        resultados = ejecutar(
+            # van las rutas: cada proceso lee su PDF desde disco, sin pasar por memoria aquí
+            FuenteArchivos(pendientes),
+            motor=args.motor,
+            parada_temprana=args.rapida,
+            destinos=[DestinoIndice(args.motor)] if args.indexar else (),
+            workers=args.workers,
+            timeout=args.timeout,
+        )
+        for numero, item in enumerate(resultados, start=1):
+            procesado = item["procesado"] or {}
+            registro = {
+                "archivo": item["doc"],
+                "hash": procesado.get("hash"),
+                "desde_cache": procesado.get("desde_cache"),
+                "resultado": procesado.get("resultado"),
+                "error": item["error"] or (procesado.get("resultado") or {}).get("error"),
+            }
+            if args.con_texto:
+                registro["texto"] = procesado.get("texto")
+            errores += bool(registro["error"])
+            destino.write(json.dumps(registro, default=_serializar, ensure_ascii=False) + "\n")
+            destino.flush()  # cada línea queda escrita aunque se interrumpa la ejecución
+            print(f"[{numero}/{len(pendientes)}] {item['doc']}", file=sys.stderr)
+    except KeyboardInterrupt:
+        print("Interrumpido: vuelve a ejecutar con la misma --salida para continuar", file=sys.stderr)
+        return 130
+    finally:
+        if destino is not sys.stdout:
+            destino.close()
+        if args.metricas is not None:
+            args.metricas.write_text(metricas.exportar_prometheus(), encoding="utf-8")
+
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
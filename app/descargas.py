@@ -0,0 +1,93 @@
+"""Descargas concurrentes de Drive con un límite de conexiones simultáneas.
+
+`descargar_lote` baja varios archivos a la vez en hilos (la espera de red no
+ocupa CPU) y entrega cada uno en cuanto termina. Como mucho hay
+`concurrencia` descargas en curso más las ya terminadas que el consumidor aún
+no ha recogido, de modo que el análisis posterior marca el ritmo
+(productor/consumidor) y la memoria queda acotada. Con un `Presupuesto` los
+PDF grandes (según el `size` del listado) se descargan a disco.
+"""
+
+from __future__ import annotations
+
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from drive_utils import TAMANO_CHUNK, descargar_pdf_drive
+from google_clients import canal_prestado
+from memoria import Presupuesto
+
+# descargas simultáneas por defecto
+CONCURRENCIA = 4
+
+
+def descargar_lote(
+    credentials,
+    archivos: Iterable[Dict[str, Any]],
+    concurrencia: int = CONCURRENCIA,
+    chunk_size: int = TAMANO_CHUNK,
+    progreso: Optional[Callable[[Dict[str, Any], float], None]] = None,
+    presupuesto: Optional[Presupuesto] = None,
+) -> Iterator[Tuple[Dict[str, Any], Any, Optional[str]]]:
+    """Descarga los `archivos` de Drive y devuelve (archivo, buffer, error) según terminan.
+
+    `progreso(archivo, fraccion)` se llama desde los hilos de descarga tras cada
+    chunk; no debe tocar la interfaz de Streamlit directamente. Con
+    `presupuesto` el buffer puede ser un archivo temporal en disco (ver
+    `Presupuesto.destino`); sin él siempre es un `BytesIO`.
+    """
+    archivos = iter(archivos)
+
+    def descargar(archivo):
+        avance = None
+        if progreso is not None:
+            avance = lambda fraccion: progreso(archivo, fraccion)
+        tamano = int(archivo.get("size") or 0)
+        destino = presupuesto.destino(tamano) if presupuesto is not None else None
+        try:
+            # un cliente por descarga en curso: el transporte HTTP no es seguro entre hilos
+            with canal_prestado(credentials, "descarga") as canal:
+                return descargar_pdf_drive(
+                    credentials,
+                    archivo["id"],
+                    chunk_size=chunk_size,
+                    canal=canal,
+                    progreso=avance,
+                    destino=destino,
+                )
+        except Exception:
+            if destino is not None:
+                presupuesto.descartar(destino, tamano)
+            raise
+
+    pendientes = {}  # future -> archivo
+    with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+        agotado = False
+        try:
+            while True:
+                while not agotado and len(pendientes) < concurrencia:
+                    archivo = next(archivos, None)
+                    if archivo is None:
+                        agotado = True
+                        break
+                    # copio el contexto para que las métricas lleguen a la sesión que pidió la descarga
+                    contexto = contextvars.copy_context()
+                    pendientes[pool.submit(contexto.run, descargar, archivo)] = archivo
+
+                if not pendientes:
+                    break
+
+                hechos, _ = wait(list(pendientes), return_when=FIRST_COMPLETED)
+                for future in hechos:
+                    archivo = pendientes.pop(future)
+                    try:
+                        yield archivo, future.result(), None
+                    except Exception as e:
+                        yield archivo, None, str(e)
+        finally:
+            # si el consumidor deja de pedir, descarto lo que nadie va a recoger
+            for future, archivo in pendientes.items():
+                if future.cancel() or presupuesto is None or future.exception() is not None:
+                    continue
+                presupuesto.descartar(future.result(), int(archivo.get("size") or 0))
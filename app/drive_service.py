@@ -1,30 +1,24 @@
-from googleapiclient.discovery import build  # para construir el cliente Drive
-from googleapiclient.http import MediaIoBaseDownload  # utilidad para descargar archivos
+from google_clients import obtener_servicio  # clientes de Google reutilizables
 from io import BytesIO  # buffer en memoria para almacenar el PDF descargado
 
+from drive_utils import listar_pdfs_drive  # listado paginado con filtros
 
-def listar_pdfs(creds, limite=10):
-    # creo el servicio de Drive usando las credenciales
-    service = build("drive", "v3", credentials=creds)
-
-    # pido a la API una lista de archivos con mimeType PDF
-    resultados = service.files().list(
-        q="mimeType='application/pdf'",
-        pageSize=limite,
-        fields="files(id, name)"
-    ).execute()
 
-    # devuelvo la lista de archivos (o lista vacía si no hay resultados)
-    return resultados.get("files", [])
+def listar_pdfs(creds, limite=10):
+    # pido a la API los PDFs paginando hasta `limite` (ver drive_utils.listar_pdfs_drive)
+    return listar_pdfs_drive(creds, limite=limite)
 
 
-def descargar_pdf(creds, file_id):
-    # construyo el servicio de Drive con las credenciales
-    service = build("drive", "v3", credentials=creds)
+def descargar_pdf(creds, file_id, destino=None):
+    # obtengo el servicio de Drive (reutilizado) para las credenciales
+    service = obtener_servicio(creds, "drive", "v3")
     # creo la petición para obtener el contenido binario del archivo
     request = service.files().get_media(fileId=file_id)
 
-    buffer = BytesIO()  # buffer en memoria donde se escribirá el PDF
+    from googleapiclient.http import MediaIoBaseDownload  # utilidad para descargar archivos
+
+    # buffer donde se escribirá el PDF: en memoria, o `destino` (p. ej. un temporal en disco)
+    buffer = destino if destino is not None else BytesIO()
     downloader = MediaIoBaseDownload(buffer, request)  # objeto que gestiona la descarga
 
     done = False
@@ -1,36 +1,116 @@
-from googleapiclient.discovery import build  # constructor de cliente para Drive
-from googleapiclient.http import MediaIoBaseDownload  # descarga por streams
+from google_clients import obtener_servicio  # clientes de Google reutilizables
+from metricas import instrumentar  # tiempos por etapa
 import io  # para crear buffers en memoria
+from datetime import datetime  # filtro por fecha de modificación
+from itertools import islice  # corto la iteración al llegar al límite
 
 
-def listar_pdfs_drive(credentials):
-    # creo el servicio usando las credenciales pasadas
-    service = build("drive", "v3", credentials=credentials)
+# campos que pedimos por archivo (respuesta parcial: solo lo que usamos)
+CAMPOS_ARCHIVO = "id, name, modifiedTime, md5Checksum, size, parents"
+# máximo de resultados por página que admite la API de Drive
+MAX_PAGINA = 1000
+# tamaño de cada petición parcial al descargar (bytes)
+TAMANO_CHUNK = 32 * 1024 * 1024
 
-    # solicito a la API una lista de archivos PDF (id y nombre)
+
+def version_archivo(archivo):
+    """Identifica la versión del contenido de un archivo del listado (None si no se sabe).
+
+    Los PDF traen `md5Checksum`; si faltara, `modifiedTime` también cambia con
+    cada nueva versión subida.
+    """
+    if archivo.get("md5Checksum"):
+        return f"md5:{archivo['md5Checksum']}"
+    if archivo.get("modifiedTime"):
+        return f"mod:{archivo['modifiedTime']}"
+    return None
+
+
+def _escapar(valor):
+    # las cadenas de la consulta de Drive van entre comillas simples
+    return str(valor).replace("\\", "\\\\").replace("'", "\\'")
+
+
+def _consulta_pdfs(carpeta=None, modificado_desde=None, nombre_contiene=None):
+    """Construye el filtro `q` para que Drive filtre en el servidor."""
+    condiciones = ["mimeType='application/pdf'", "trashed=false"]
+    if carpeta:
+        condiciones.append(f"'{_escapar(carpeta)}' in parents")
+    if modificado_desde:
+        if not isinstance(modificado_desde, datetime):  # acepto también un `date`
+            modificado_desde = datetime.combine(modificado_desde, datetime.min.time())
+        condiciones.append(f"modifiedTime > '{modificado_desde.strftime('%Y-%m-%dT%H:%M:%S')}'")
+    if nombre_contiene:
+        condiciones.append(f"name contains '{_escapar(nombre_contiene)}'")
+    return " and ".join(condiciones)
+
+
+def pagina_pdfs_drive(credentials, token_pagina=None, tamano_pagina=50, **filtros):
+    """Devuelve una página del listado de PDFs como (archivos, token de la siguiente o None).
+
+    `filtros` admite `carpeta` (id), `modificado_desde` (date/datetime) y
+    `nombre_contiene`; se aplican en el servidor.
+    """
+    # obtengo el servicio (reutilizado) para las credenciales pasadas
+    service = obtener_servicio(credentials, "drive", "v3")
+
+    # solicito a la API una página de archivos PDF con los campos necesarios
     results = service.files().list(
-        q="mimeType='application/pdf'",
-        fields="files(id, name)",
-        pageSize=20
+        q=_consulta_pdfs(**filtros),
+        fields=f"nextPageToken, files({CAMPOS_ARCHIVO})",
+        pageSize=min(tamano_pagina, MAX_PAGINA),
+        pageToken=token_pagina,
+        orderBy="modifiedTime desc",
+        supportsAllDrives=True,  # incluyo unidades compartidas
+        includeItemsFromAllDrives=True,
     ).execute()
 
-    # devuelvo la lista de archivos o lista vacía
-    return results.get("files", [])
+    # devuelvo la lista de archivos (o lista vacía) y el token de la siguiente página
+    return results.get("files", []), results.get("nextPageToken")
+
+
+def iterar_pdfs_drive(credentials, tamano_pagina=MAX_PAGINA, **filtros):
+    """Recorre perezosamente todos los PDFs, pidiendo páginas según se consumen."""
+    token = None
+    while True:
+        archivos, token = pagina_pdfs_drive(credentials, token, tamano_pagina, **filtros)
+        yield from archivos
+        if not token:
+            return
 
 
-def descargar_pdf_drive(credentials, file_id):
-    # construyo el servicio de Drive
-    service = build("drive", "v3", credentials=credentials)
+def listar_pdfs_drive(credentials, limite=20, **filtros):
+    """Devuelve hasta `limite` PDFs (todos si `limite` es None), siguiendo la paginación."""
+    tamano_pagina = min(limite, MAX_PAGINA) if limite else MAX_PAGINA
+    return list(islice(iterar_pdfs_drive(credentials, tamano_pagina, **filtros), limite))
+
+
+@instrumentar("descargar_pdf_drive")
+def descargar_pdf_drive(credentials, file_id, chunk_size=TAMANO_CHUNK, canal=0, progreso=None, destino=None):
+    """Descarga un PDF de Drive en memoria o en el archivo `destino`.
+
+    `chunk_size` fija el tamaño de cada petición parcial, `canal` permite usar un
+    cliente propio por hilo (ver `google_clients.obtener_servicio`) y `progreso`,
+    si se indica, recibe la fracción descargada (0 a 1) tras cada chunk.
+    `destino` es un archivo binario abierto para escribir (p. ej. un temporal
+    en disco para PDF grandes, ver `memoria.Presupuesto.destino`).
+    """
+    # obtengo el servicio de Drive (reutilizado)
+    service = obtener_servicio(credentials, "drive", "v3", canal)
 
     # creo la petición para obtener el contenido del archivo
     request = service.files().get_media(fileId=file_id)
-    fh = io.BytesIO()  # buffer en memoria
+    fh = destino if destino is not None else io.BytesIO()  # buffer en memoria por defecto
+
+    # uso MediaIoBaseDownload para descargar por chunks (import diferido: es lento)
+    from googleapiclient.http import MediaIoBaseDownload
 
-    # uso MediaIoBaseDownload para descargar por chunks
-    downloader = MediaIoBaseDownload(fh, request)
+    downloader = MediaIoBaseDownload(fh, request, chunksize=chunk_size)
     done = False
     while not done:
-        _, done = downloader.next_chunk()  # descargo hasta completar
+        status, done = downloader.next_chunk()  # descargo hasta completar
+        if progreso is not None:
+            progreso(1.0 if done else status.progress())
 
     fh.seek(0)  # vuelvo al inicio del buffer
     return fh  # devuelvo el buffer con el PDF
@@ -0,0 +1,79 @@
+"""Interpretación de fechas en español con patrones precompilados.
+
+Reconoce "12/03/2026", "12-03-26", "12 de marzo de 2026", "12 de marzo del
+2026", meses abreviados ("12 mar. 2026", "12-sep-2026"), fechas ISO
+("2026-03-12") y textos con el día de la semana delante ("lunes, 12 de marzo
+de 2026"). La fecha se arma directamente con los números capturados, sin
+probar formatos con `strptime`, y el resultado se memoiza por texto: en los
+anexos las mismas fechas se repiten muchas veces.
+"""
+
+from __future__ import annotations
+
+import re
+from calendar import monthrange
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional
+
+MESES = {
+    "enero": 1, "febrero": 2, "marzo": 3, "abril": 4,
+    "mayo": 5, "junio": 6, "julio": 7, "agosto": 8,
+    "septiembre": 9, "setiembre": 9, "octubre": 10, "noviembre": 11, "diciembre": 12,
+    # abreviaturas
+    "ene": 1, "feb": 2, "mar": 3, "abr": 4, "may": 5, "jun": 6, "jul": 7,
+    "ago": 8, "sep": 9, "sept": 9, "set": 9, "oct": 10, "nov": 11, "dic": 12,
+}
+
+# las más largas primero para que "septiembre" no se quede en "sep"
+_MESES = "|".join(sorted(MESES, key=len, reverse=True))
+
+# Patrones sin grupos de captura, en minúsculas, para el localizador de `analyzer`
+# (el orden importa: define el orden de las fechas encontradas). Todos empiezan
+# por dígitos; el analizador descarta los que tienen otro dígito justo antes.
+PATRONES_FECHA = [
+    r"\d{1,2}[/-]\d{1,2}[/-](?:\d{4}|\d{2})(?!\d)",  # dd/mm/aaaa, dd-mm-aa
+    rf"\d{{1,2}}(?:\s+de\s+|\s+|[-/])(?:{_MESES})\.?(?:\s+del?\s+|,?\s+|[-/])(?:\d{{4}}|\d{{2}})(?!\d)",  # '12 de marzo del 2026'
+    r"\d{4}[/-]\d{1,2}[/-]\d{1,2}(?!\d)",  # ISO: aaaa-mm-dd
+]
+
+# los mismos patrones con grupos con nombre, para armar la fecha
+_PATRON = re.compile(
+    r"(?<!\d)(?:"
+    r"(?P<dia_n>\d{1,2})[/-](?P<mes_n>\d{1,2})[/-](?P<anio_n>\d{4}|\d{2})"
+    rf"|(?P<dia_t>\d{{1,2}})(?:\s+de\s+|\s+|[-/])(?P<mes_t>{_MESES})\.?(?:\s+del?\s+|,?\s+|[-/])(?P<anio_t>\d{{4}}|\d{{2}})"
+    r"|(?P<anio_i>\d{4})[/-](?P<mes_i>\d{1,2})[/-](?P<dia_i>\d{1,2})"
+    r")(?!\d)"
+)
+
+
+def _anio(valor: str) -> int:
+    anio = int(valor)
+    if len(valor) == 2:  # como %y: 69-99 son 1900, 00-68 son 2000
+        anio += 1900 if anio >= 69 else 2000
+    return anio
+
+
+def _armar(anio: int, mes: int, dia: int) -> Optional[datetime]:
+    # valido el día con el calendario en vez de capturar el ValueError de datetime
+    if not (1 <= mes <= 12 and 1 <= anio <= 9999) or not 1 <= dia <= monthrange(anio, mes)[1]:
+        return None
+    return datetime(anio, mes, dia)
+
+
+@lru_cache(maxsize=4096)
+def interpretar_fecha(texto: str) -> Optional[datetime]:
+    """Devuelve la primera fecha reconocible dentro de `texto`, o None.
+
+    Admite texto alrededor de la fecha (p. ej. "el lunes 12 de marzo del 2026"),
+    como las entidades DATE de spaCy.
+    """
+    match = _PATRON.search(texto.lower())
+    if match is None:
+        return None
+    grupos = match.groupdict()
+    if grupos["dia_n"] is not None:
+        return _armar(_anio(grupos["anio_n"]), int(grupos["mes_n"]), int(grupos["dia_n"]))
+    if grupos["dia_t"] is not None:
+        return _armar(_anio(grupos["anio_t"]), MESES[grupos["mes_t"]], int(grupos["dia_t"]))
+    return _armar(int(grupos["anio_i"]), int(grupos["mes_i"]), int(grupos["dia_i"]))
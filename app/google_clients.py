@@ -0,0 +1,106 @@
+"""Registro de clientes de Google API reutilizables.
+
+Construir un servicio con `build(...)` vuelve a cargar el documento de
+descubrimiento y crea un transporte HTTP nuevo. Aquí se guardan los servicios
+ya construidos por usuario y (api, versión), de modo que las llamadas
+siguientes reutilizan el cliente y sus conexiones abiertas. Los hilos en
+segundo plano piden prestado un canal numerado con `canal_prestado`, así cada
+usuario tiene a lo sumo tantos servicios como hilos los usaron a la vez.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# usuarios con servicios guardados a la vez; los menos usados se descartan primero
+MAX_USUARIOS = int(os.environ.get("GESTOR_MAX_USUARIOS_GOOGLE", "64"))
+# segundos sin uso tras los que se descartan los servicios de un usuario
+INACTIVIDAD = 3600
+
+_LOCK = threading.Lock()
+# usuario -> {"usado": instante, "servicios": {(api, version, canal): servicio}}, del más
+# antiguo al más reciente. Cada servicio retiene sus credenciales, así que las
+# entradas se descartan aquí (LRU + inactividad) y no al liberar las credenciales.
+_SERVICIOS: "OrderedDict[object, dict]" = OrderedDict()
+# (usuario, grupo) -> índices de canal prestados ahora mismo (ver `canal_prestado`)
+_CANALES_EN_USO = {}
+
+
+def clave_usuario(creds):
+    """Identidad estable del usuario: su token de refresco, aunque cambie el objeto de credenciales."""
+    return getattr(creds, "refresh_token", None) or getattr(creds, "token", None) or id(creds)
+
+
+def _podar(ahora):
+    # con `_LOCK` tomado
+    while _SERVICIOS:
+        usuario, entrada = next(iter(_SERVICIOS.items()))
+        if len(_SERVICIOS) <= MAX_USUARIOS and ahora - entrada["usado"] < INACTIVIDAD:
+            break
+        del _SERVICIOS[usuario]
+
+
+def obtener_servicio(creds, api, version, canal=0):
+    """Devuelve el servicio `api`/`version` para `creds`, construyéndolo solo la primera vez.
+
+    El transporte HTTP (httplib2) no es seguro entre hilos: quien use el mismo
+    servicio desde varios hilos a la vez debe pedir un `canal` distinto por hilo.
+    """
+    usuario, clave, ahora = clave_usuario(creds), (api, version, canal), time.monotonic()
+    with _LOCK:
+        _podar(ahora)
+        entrada = _SERVICIOS.get(usuario)
+        if entrada is not None:
+            entrada["usado"] = ahora
+            _SERVICIOS.move_to_end(usuario)
+            servicio = entrada["servicios"].get(clave)
+            if servicio is not None:
+                return servicio
+
+    # googleapiclient tarda en importarse: lo hago solo cuando hace falta construir
+    from googleapiclient.discovery import build
+
+    servicio = build(api, version, credentials=creds)
+    with _LOCK:
+        entrada = _SERVICIOS.setdefault(usuario, {"usado": ahora, "servicios": {}})
+        _SERVICIOS.move_to_end(usuario)
+        entrada["servicios"][clave] = servicio
+        _podar(ahora)
+    return servicio
+
+
+@contextmanager
+def canal_prestado(creds, grupo):
+    """Presta a este hilo el canal libre más bajo de `grupo` (p. ej. ("descarga", 0)).
+
+    Los canales se devuelven al salir del bloque y los reutilizan los hilos
+    siguientes: los servicios de un usuario quedan acotados por cuántos hilos
+    los usan a la vez, no por cuántos hilos existieron.
+    """
+    clave = (clave_usuario(creds), grupo)
+    with _LOCK:
+        en_uso = _CANALES_EN_USO.setdefault(clave, set())
+        indice = 0
+        while indice in en_uso:
+            indice += 1
+        en_uso.add(indice)
+    try:
+        yield (grupo, indice)
+    finally:
+        with _LOCK:
+            en_uso.discard(indice)
+            if not en_uso:
+                _CANALES_EN_USO.pop(clave, None)
+
+
+def invalidar_servicios(creds=None):
+    """Descarta los servicios de `creds` (o todos si no se indican), p. ej. al cerrar sesión."""
+    with _LOCK:
+        if creds is None:
+            _SERVICIOS.clear()
+        else:
+            _SERVICIOS.pop(clave_usuario(creds), None)
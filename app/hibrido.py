@@ -0,0 +1,109 @@
+"""Extracción híbrida: primero las reglas y spaCy solo para lo que falte.
+
+Las reglas de `analyzer` se ejecutan siempre (son baratas) y a cada campo se le
+asigna una confianza entre 0 y 1 según cómo se encontró. Solo si el
+responsable o la fecha límite quedan por debajo de `UMBRAL_CONFIANZA` se llama
+al NER de spaCy, y solo se usan sus resultados para esos campos. El resultado
+indica en `origen` qué motor produjo cada campo ("reglas", "ia" o None).
+
+Los memos que siguen la plantilla (línea "PARA:" o "Encargado:", fecha tras
+"hasta"/"plazo") se resuelven sin cargar el modelo.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, Optional, Tuple
+
+import metricas
+from analyzer import VERSION_ANALIZADOR, analizar_documento, escanear_texto
+from ai_extractor import VERSION_IA, extraer_entidades_ia
+from metricas import instrumentar
+
+# Versión del análisis híbrido: incluye las de los dos motores que combina
+VERSION_HIBRIDO = f"hibrido-1+{VERSION_ANALIZADOR}+{VERSION_IA}"
+
+# por debajo de esta confianza se pregunta a spaCy
+UMBRAL_CONFIANZA = 0.6
+
+# distancia (en caracteres) entre la palabra clave y la fecha para fiarse de ella
+_DISTANCIA_CERCANA = 60
+_DISTANCIA_MEDIA = 200
+
+# "PARA: Nombre" en la cabecera del memo (el destinatario suele ser el responsable)
+_PATRON_PARA = re.compile(r"^[^\S\n]*para[^\S\n]*:[^\S\n]*(\S[^\n]*)$", re.IGNORECASE | re.MULTILINE)
+# "Encargado: Nombre" o "Encargado - Nombre"
+_PREFIJO_ENCARGADO = re.compile(r"^encargado\s*[:\-]?\s*", re.IGNORECASE)
+# un nombre tiene al menos dos palabras seguidas que empiezan en mayúscula
+_NOMBRE = re.compile(r"[A-ZÁÉÍÓÚÑ]\w*\.?\s+[A-ZÁÉÍÓÚÑ]")
+
+
+def _responsable_por_reglas(texto: str, encargado: Optional[str]) -> Tuple[Optional[str], float]:
+    """(responsable, confianza) según la línea "Encargado:" o, si no hay, la de "PARA:"."""
+    if encargado:
+        nombre = _PREFIJO_ENCARGADO.sub("", encargado).strip()
+        if _NOMBRE.search(nombre):
+            return nombre, 0.9
+        if nombre:
+            return nombre, 0.4  # hay algo tras "encargado", pero no parece un nombre
+    match = _PATRON_PARA.search(texto)
+    if match and _NOMBRE.search(match.group(1)):
+        return match.group(1).strip(), 0.7
+    return None, 0.0
+
+
+def _confianza_fecha(resultado: Dict[str, Any]) -> float:
+    if resultado["fecha_detectada"] is None:
+        return 0.0
+    candidatos = resultado["candidatos_fecha"]
+    if not candidatos:
+        return 0.3  # sin palabra clave: es solo la fecha más lejana del texto
+    distancia = candidatos[0][1]
+    if distancia <= _DISTANCIA_CERCANA:
+        return 0.9
+    return 0.6 if distancia <= _DISTANCIA_MEDIA else 0.4
+
+
+@instrumentar("analizar_documento_hibrido")
+def analizar_documento_hibrido(texto: str) -> Dict[str, Any]:
+    """Analiza con reglas y completa con spaCy solo los campos de baja confianza.
+
+    Devuelve los campos de `analizar_documento` (con `responsable` ya sin el
+    prefijo "Encargado:") más `origen` y `confianza` por campo. Si hacía falta
+    spaCy y el modelo no está instalado se conservan los valores de las reglas
+    y se marca `incompleto` (para no guardarlo en la caché) con `aviso`.
+    """
+    resultado = analizar_documento(texto)
+    responsable, confianza_responsable = _responsable_por_reglas(
+        texto, escanear_texto(texto).encargado
+    )
+    resultado["responsable"] = responsable
+    confianza = {
+        "asunto": 1.0 if resultado["asunto"] else 0.0,
+        "responsable": confianza_responsable,
+        "fecha_detectada": _confianza_fecha(resultado),
+    }
+    origen = {campo: "reglas" if resultado[campo] else None for campo in confianza}
+
+    # el asunto solo lo obtienen las reglas: spaCy no ayuda con él
+    pendientes = [
+        campo for campo in ("responsable", "fecha_detectada") if confianza[campo] < UMBRAL_CONFIANZA
+    ]
+    if not pendientes:
+        metricas.contar("ia_omitida", "hibrido")
+    else:
+        metricas.contar("ia_invocada", "hibrido")
+        ia_info = extraer_entidades_ia(texto)
+        if ia_info.get("error"):
+            resultado["aviso"] = ia_info["error"]
+            resultado["incompleto"] = True
+        else:
+            valores_ia = {"responsable": ia_info.get("responsable"), "fecha_detectada": ia_info.get("fecha_limite")}
+            for campo in pendientes:
+                if valores_ia[campo] is not None:
+                    resultado[campo] = valores_ia[campo]
+                    origen[campo] = "ia"
+
+    resultado["origen"] = origen
+    resultado["confianza"] = confianza
+    return resultado
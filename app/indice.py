@@ -0,0 +1,176 @@
+"""Índice de búsqueda de texto completo sobre los documentos analizados.
+
+Cada documento analizado se guarda con su origen ("drive:<id>", "local:<nombre>"
+o "archivo:<ruta>"), los campos extraídos (asunto, responsable, fecha límite,
+acción) y el texto, en una tabla FTS5 de SQLite. La búsqueda devuelve los
+documentos ordenados por relevancia (bm25) sin volver a analizar nada. A
+diferencia de la caché, el índice no expulsa entradas.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import sqlite3
+import time
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Ruta de la base de datos del índice (configurable por variable de entorno)
+INDICE_DB = os.environ.get("GESTOR_INDICE_DB", ".cache/indice.sqlite3")
+
+# peso de cada columna en la relevancia: nombre, asunto, responsable, texto
+_PESOS = (2.0, 5.0, 3.0, 1.0)
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS documentos (
+    id INTEGER PRIMARY KEY,
+    origen TEXT NOT NULL UNIQUE,
+    nombre TEXT NOT NULL,
+    hash TEXT,
+    motor TEXT,
+    asunto TEXT,
+    responsable TEXT,
+    fecha_limite TEXT,
+    accion TEXT,
+    actualizado REAL NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS busqueda USING fts5(
+    nombre, asunto, responsable, texto,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+
+def _conectar() -> sqlite3.Connection:
+    Path(INDICE_DB).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(INDICE_DB, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_ESQUEMA)
+    return conn
+
+
+def _fecha_iso(valor) -> Optional[str]:
+    if isinstance(valor, datetime):
+        return valor.date().isoformat()
+    return valor
+
+
+def indexar(
+    origen: str,
+    nombre: str,
+    texto: str,
+    resultado: Dict[str, Any],
+    hash_pdf: Optional[str] = None,
+    motor: str = "reglas",
+):
+    """Agrega o actualiza el documento `origen` en el índice.
+
+    `resultado` es el diccionario de `analizar_documento` o `analizar_documento_ia`.
+    Si el documento ya está indexado con el mismo hash y motor no se reescribe.
+    """
+    fila = (
+        nombre,
+        hash_pdf,
+        motor,
+        resultado.get("asunto"),
+        resultado.get("responsable"),
+        _fecha_iso(resultado.get("fecha_detectada")),
+        resultado.get("accion"),
+        time.time(),
+    )
+    try:
+        with closing(_conectar()) as conn, conn:
+            conn.execute("BEGIN IMMEDIATE")
+            existente = conn.execute(
+                "SELECT id, hash, motor FROM documentos WHERE origen = ?", (origen,)
+            ).fetchone()
+            if existente is not None and hash_pdf and existente[1:] == (hash_pdf, motor):
+                return  # sin cambios
+
+            if existente is None:
+                id_doc = conn.execute(
+                    "INSERT INTO documentos (nombre, hash, motor, asunto, responsable, "
+                    "fecha_limite, accion, actualizado, origen) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    fila + (origen,),
+                ).lastrowid
+            else:
+                id_doc = existente[0]
+                conn.execute(
+                    "UPDATE documentos SET nombre = ?, hash = ?, motor = ?, asunto = ?, "
+                    "responsable = ?, fecha_limite = ?, accion = ?, actualizado = ? WHERE id = ?",
+                    fila + (id_doc,),
+                )
+                conn.execute("DELETE FROM busqueda WHERE rowid = ?", (id_doc,))
+
+            conn.execute(
+                "INSERT INTO busqueda (rowid, nombre, asunto, responsable, texto) VALUES (?, ?, ?, ?, ?)",
+                (id_doc, nombre, fila[3] or "", fila[4] or "", texto),
+            )
+    except sqlite3.Error as e:
+        print(f"Error al indexar {origen}: {e}")
+
+
+def _consulta_fts(consulta: str) -> str:
+    # cada palabra va entre comillas (así los signos no rompen la sintaxis de FTS5)
+    # y la última admite prefijo, para buscar mientras se escribe
+    palabras = re.findall(r"\w+", consulta)
+    if not palabras:
+        return ""
+    terminos = [f'"{p}"' for p in palabras]
+    terminos[-1] += "*"
+    return " ".join(terminos)
+
+
+def buscar(consulta: str, limite: int = 20) -> List[Dict[str, Any]]:
+    """Devuelve los documentos que contienen todas las palabras, del más al menos relevante.
+
+    Cada resultado trae los campos extraídos y un `fragmento` del texto con las
+    coincidencias marcadas entre `**`.
+    """
+    expresion = _consulta_fts(consulta)
+    if not expresion:
+        return []
+    try:
+        with closing(_conectar()) as conn:
+            filas = conn.execute(
+                f"""
+                SELECT d.origen, d.nombre, d.asunto, d.responsable, d.fecha_limite, d.accion,
+                       snippet(busqueda, 3, '**', '**', '…', 16),
+                       bm25(busqueda, {', '.join(map(str, _PESOS))}) AS puntaje
+                FROM busqueda JOIN documentos d ON d.id = busqueda.rowid
+                WHERE busqueda MATCH ?
+                ORDER BY puntaje
+                LIMIT ?
+                """,
+                (expresion, limite),
+            ).fetchall()
+    except sqlite3.Error as e:
+        print(f"Error al buscar en el índice: {e}")
+        return []
+
+    columnas = ("origen", "nombre", "asunto", "responsable", "fecha_limite", "accion", "fragmento", "puntaje")
+    return [dict(zip(columnas, fila)) for fila in filas]
+
+
+def contar_documentos() -> int:
+    try:
+        with closing(_conectar()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM documentos").fetchone()[0]
+    except sqlite3.Error as e:
+        print(f"Error al leer el índice: {e}")
+        return 0
+
+
+def eliminar(origen: str):
+    """Quita un documento del índice."""
+    try:
+        with closing(_conectar()) as conn, conn:
+            fila = conn.execute("SELECT id FROM documentos WHERE origen = ?", (origen,)).fetchone()
+            if fila is not None:
+                conn.execute("DELETE FROM busqueda WHERE rowid = ?", fila)
+                conn.execute("DELETE FROM documentos WHERE id = ?", fila)
+    except sqlite3.Error as e:
+        print(f"Error al eliminar {origen} del índice: {e}")
@@ -0,0 +1,416 @@
+"""Piezas de la interfaz compartidas por `main.py` (reglas) y `main_ai.py` (híbrido).
+
+Cada página elige el motor, cómo se muestra un resultado y sus etiquetas (con
+o sin iconos); lo demás vive aquí: listar Drive, subir PDFs, buscar en el
+índice, lanzar el flujo de `pipeline` en segundo plano, seguir su progreso e
+informar de los eventos que creó en Google Calendar.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+
+import streamlit as st
+
+import metricas
+from analyzer import calcular_fecha_agenda
+from calendar_utils import obtener_eventos_calendar
+from drive_utils import pagina_pdfs_drive
+from indice import buscar
+from memoria import Presupuesto
+from pipeline import DestinoAgenda, DestinoIndice, FuenteDrive, FuenteSubidos
+from trabajos import GestorTrabajos, tarea_pipeline
+
+# segundos entre consultas al estado de un análisis en segundo plano
+INTERVALO_SONDEO = 1.0
+
+# textos de la interfaz con iconos (main.py)
+ETIQUETAS = {
+    "titulo_drive": "### ☁️ Google Drive",
+    "filtros": "🔎 Filtros",
+    "cargar_drive": "📥 Cargar PDFs desde Drive",
+    "cargar_mas": "➕ Cargar más PDFs",
+    "titulo_subida": "### 📎 Subir desde tu equipo",
+    "lectura_rapida": "⚡ Lectura rápida (solo las primeras páginas)",
+    "titulo_calendar": "### 📅 Google Calendar",
+    "calendar_conectado": "✅ Conectado a Google Calendar",
+    "proximos_eventos": "#### 📌 Próximos eventos (30 días):",
+    "evento": "📋 ",
+    "abrir_evento": "🔗 Abrir en Google Calendar",
+    "sin_eventos": "📭 No hay eventos próximos en los próximos 30 días",
+    "calendar_sin_sesion": "⏳ Inicia sesión para ver Google Calendar",
+    "buscar": "🔎 Buscar en documentos analizados",
+    "fecha": "📅 ",
+    "responsable": "👤 ",
+    "documentos_drive": "📄 Documentos desde Drive",
+    "analizar_drive": "⚙️ Analizar documentos de Drive",
+    "titulo_locales": "### 📎 PDFs locales",
+    "cancelar": "✖️ Cancelar análisis",
+    "metricas": "📊 Mostrar métricas",
+}
+
+# los mismos textos sin iconos (main_ai.py)
+ETIQUETAS_TEXTO = {
+    "titulo_drive": "### Google Drive",
+    "filtros": "Filtros",
+    "cargar_drive": "Cargar PDFs desde Drive",
+    "cargar_mas": "Cargar más PDFs",
+    "titulo_subida": "### Subir desde tu equipo",
+    "lectura_rapida": "Lectura rápida (solo las primeras páginas)",
+    "titulo_calendar": "### Google Calendar",
+    "calendar_conectado": "Conectado a Google Calendar",
+    "proximos_eventos": "#### Próximos eventos (30 días):",
+    "evento": "",
+    "abrir_evento": "Abrir en Google Calendar",
+    "sin_eventos": "No hay eventos próximos en los próximos 30 días",
+    "calendar_sin_sesion": "Inicia sesión para ver Google Calendar",
+    "buscar": "Buscar en documentos analizados",
+    "fecha": "Fecha límite: ",
+    "responsable": "Responsable: ",
+    "documentos_drive": "Documentos desde Drive",
+    "analizar_drive": "Analizar documentos de Drive",
+    "titulo_locales": "### PDFs locales",
+    "cancelar": "Cancelar análisis",
+    "metricas": "Mostrar métricas",
+}
+
+
+def preparar_sesion():
+    """Valores por defecto de la sesión y métricas del rerun (solo si la sesión las pidió)."""
+    st.session_state.setdefault("credentials", None)
+    st.session_state.setdefault("metricas_sesion", metricas.Sesion())
+    st.session_state.setdefault("agendas", {})  # id de trabajo -> DestinoAgenda aún sin informar
+    st.session_state.setdefault("presupuesto_memoria", Presupuesto())  # PDFs grandes van a disco
+
+    # los tiempos medidos en este rerun (y en sus descargas) se suman a la sesión;
+    # solo se toman si esta sesión los pidió en la barra lateral, no en todo el servidor
+    metricas.usar_sesion(st.session_state.metricas_sesion, activa=bool(st.session_state.get("ver_metricas")))
+
+
+@st.cache_resource
+def gestor_trabajos():
+    """Gestor de trabajos compartido por todas las sesiones del servidor."""
+    return GestorTrabajos()
+
+
+def datos_evento(res, accion=None):
+    """Datos del evento de Calendar de un documento analizado (se llama desde el trabajo).
+
+    El título empieza por `accion` o, si no se indica, por la acción detectada.
+    """
+    analisis = res["procesado"]["resultado"]
+    asunto, nombre = analisis.get("asunto"), res["nombre"]
+    accion = accion or analisis["accion"]
+    return {
+        "titulo": f"{accion}: {asunto}" if asunto else f"{accion}: {nombre}",
+        "descripcion": (
+            f"Documento analizado: {nombre}\n"
+            f"Asunto: {asunto if asunto else 'No detectado'}"
+        ),
+        "fecha_limite": calcular_fecha_agenda(analisis.get("fecha_detectada")),
+        "hash_documento": res["procesado"]["hash"],  # evita duplicarlo en otra sesión
+    }
+
+
+def informar_agenda(agenda):
+    """Muestra el resultado de los eventos que el trabajo creó en lote al terminar."""
+    if not agenda.terminado:
+        return  # el destino aún no cerró: se informa en el siguiente rerun
+    if agenda.cancelado:
+        st.info("Análisis cancelado: no se crearon eventos en Google Calendar")
+        return
+    if agenda.error:
+        st.error(f"No se pudieron crear los eventos: {agenda.error}")
+        return
+
+    creados = existentes = 0
+    for clave, resultado in agenda.resultados.items():
+        if resultado.get("error"):
+            st.error(f"No se pudo crear el evento de {agenda.nombres[clave]}: {resultado['error']}")
+        elif resultado.get("existente"):
+            existentes += 1
+        else:
+            creados += 1
+
+    if creados:
+        st.success(f"{creados} evento(s) creado(s) en tu Google Calendar")
+    if existentes:
+        st.info(f"{existentes} documento(s) ya tenían evento en tu Google Calendar")
+
+
+def lanzar_trabajo(clave_sesion, descripcion, fuente, motor, parada_temprana, accion=None):
+    """Analiza en segundo plano los documentos de `fuente` y guarda el trabajo en `clave_sesion`.
+
+    Cada documento se agrega al índice de búsqueda y, con sesión iniciada, sus
+    eventos se crean en lote al terminar el trabajo (ver `datos_evento`).
+    """
+    destinos = [DestinoIndice(motor)]
+    agenda = None
+    if st.session_state.get("credentials"):
+        agenda = DestinoAgenda(
+            st.session_state.get("credentials"), lambda res: datos_evento(res, accion)
+        )
+        destinos.append(agenda)
+    trabajo = gestor_trabajos().enviar(
+        descripcion,
+        fuente.total,
+        tarea_pipeline(fuente, motor=motor, parada_temprana=parada_temprana, destinos=destinos),
+    )
+    st.session_state[clave_sesion] = trabajo.id
+    st.session_state.agendas[trabajo.id] = agenda
+    return trabajo
+
+
+def mostrar_trabajo(clave_sesion, mostrar_resultado, etiquetas=ETIQUETAS):
+    """Muestra con `mostrar_resultado` los resultados del trabajo de `clave_sesion` a medida que llegan.
+
+    Mientras el trabajo sigue activo, solo este fragmento se vuelve a ejecutar
+    cada INTERVALO_SONDEO segundos; el resto de la página sigue usable. Al
+    terminar se informa de los eventos que creó el trabajo.
+    """
+    trabajo = gestor_trabajos().obtener(st.session_state.get(clave_sesion))
+    if trabajo is None:
+        return
+    sondeando = trabajo.activo
+
+    @st.fragment(run_every=INTERVALO_SONDEO if sondeando else None)
+    def panel():
+        resultados = list(trabajo.resultados)
+        if trabajo.activo:
+            st.progress(
+                trabajo.progreso(),
+                text=f"{len(resultados)} de {trabajo.total} documentos ({trabajo.descripcion})",
+            )
+            if trabajo.cancelacion.is_set():
+                st.caption("Cancelando...")
+            elif st.button(etiquetas["cancelar"], key=f"cancelar_{trabajo.id}"):
+                trabajo.cancelar()
+        elif trabajo.estado == "cancelado":
+            st.warning(f"Análisis cancelado: {len(resultados)} de {trabajo.total} documentos analizados")
+        elif trabajo.estado == "error":
+            st.error(f"El análisis falló: {trabajo.error}")
+
+        for res in resultados:
+            mostrar_resultado(res)
+
+        if sondeando and not trabajo.activo:
+            st.rerun()  # recargo la página entera para dejar de sondear
+        elif not trabajo.activo:
+            agenda = st.session_state.agendas.get(trabajo.id)
+            if agenda is not None and agenda.terminado:
+                informar_agenda(st.session_state.agendas.pop(trabajo.id))
+
+    panel()
+
+
+def panel_drive(etiquetas=ETIQUETAS):
+    """Lista los PDF de Drive (por páginas y con filtros) en `st.session_state.archivos_drive`."""
+    with st.container(border=True):
+        st.markdown(etiquetas["titulo_drive"])
+        st.caption("Carga y analiza PDFs desde tu cuenta de Google")
+
+        # filtros que aplica la API de Drive (no traemos todo para filtrar aquí)
+        with st.expander(etiquetas["filtros"]):
+            filtros_drive = {
+                "nombre_contiene": st.text_input("Nombre contiene") or None,
+                "carpeta": st.text_input("ID de carpeta") or None,
+                "modificado_desde": st.date_input("Modificados desde", value=None),
+            }
+
+        # botón para listar PDFs desde Drive (primera página)
+        if st.button(etiquetas["cargar_drive"], use_container_width=True):
+            if not st.session_state.credentials:
+                st.warning("Debes iniciar sesión para acceder a Google Drive.")
+            else:
+                with st.spinner("Conectando con Google Drive..."):
+                    archivos, siguiente = pagina_pdfs_drive(
+                        st.session_state.get("credentials"),
+                        **filtros_drive,
+                    )
+                    st.session_state.archivos_drive = archivos
+                    st.session_state.drive_siguiente = siguiente
+                    st.session_state.drive_filtros = filtros_drive
+
+        # siguientes páginas, con los mismos filtros del listado actual
+        if st.session_state.get("drive_siguiente") and st.session_state.get("credentials"):
+            if st.button(etiquetas["cargar_mas"], use_container_width=True):
+                with st.spinner("Conectando con Google Drive..."):
+                    archivos, siguiente = pagina_pdfs_drive(
+                        st.session_state.get("credentials"),
+                        st.session_state.drive_siguiente,
+                        **st.session_state.drive_filtros,
+                    )
+                    st.session_state.archivos_drive = st.session_state.archivos_drive + archivos
+                    st.session_state.drive_siguiente = siguiente
+
+
+def panel_subida(etiquetas=ETIQUETAS):
+    """Selector de PDFs locales; devuelve los archivos subidos para `analizar_locales`.
+
+    Los `UploadedFile` no se guardan en la sesión: solo viven en el uploader.
+    """
+    with st.container(border=True):
+        st.markdown(etiquetas["titulo_subida"])
+        st.caption("Arrastra uno o varios documentos PDF")
+
+        # uploader para archivos locales (acepta múltiples)
+        return st.file_uploader(
+            "Selecciona archivos PDF",
+            type=["pdf"],
+            accept_multiple_files=True,
+            label_visibility="collapsed",
+        )
+
+
+def opcion_lectura_rapida(etiquetas=ETIQUETAS) -> bool:
+    """Opción común a Drive y PDFs locales: útil con anexos de muchas páginas."""
+    return st.checkbox(
+        etiquetas["lectura_rapida"],
+        help="Deja de leer cada PDF en cuanto encuentra el asunto y una fecha límite.",
+    )
+
+
+def panel_calendar(etiquetas=ETIQUETAS):
+    """Próximos eventos (30 días) del calendario del usuario."""
+    with st.container(border=True):
+        st.markdown(etiquetas["titulo_calendar"])
+        st.caption("Eventos agendados y preparados")
+
+        if not st.session_state.get("credentials"):
+            st.warning(etiquetas["calendar_sin_sesion"])
+            return
+        st.success(etiquetas["calendar_conectado"])
+
+        eventos = obtener_eventos_calendar(st.session_state.get("credentials"), dias=30)
+        if not eventos:
+            st.info(etiquetas["sin_eventos"])
+            return
+
+        st.markdown(etiquetas["proximos_eventos"])
+        for evento in eventos:
+            inicio = evento.get("start", {}).get("dateTime", evento.get("start", {}).get("date", "N/A"))
+            titulo = evento.get("summary", "Sin título")
+            descripcion = evento.get("description", "")[:100]  # primeros 100 caracteres
+
+            try:
+                if "T" in inicio:
+                    fecha_obj = datetime.fromisoformat(inicio.replace("Z", "+00:00"))
+                    fecha_formateada = fecha_obj.strftime("%d/%m/%Y %H:%M")
+                else:
+                    fecha_formateada = inicio
+            except Exception:
+                fecha_formateada = inicio
+
+            with st.expander(f"{etiquetas['evento']}{titulo} - {fecha_formateada}"):
+                st.write(f"**Fecha:** {fecha_formateada}")
+                if descripcion:
+                    st.write(f"**Detalles:** {descripcion}")
+                enlace = evento.get("htmlLink", "")
+                if enlace:
+                    st.markdown(f"[{etiquetas['abrir_evento']}]({enlace})")
+
+
+def panel_busqueda(etiquetas=ETIQUETAS):
+    """Búsqueda en todo lo analizado antes (índice local, sin volver a analizar)."""
+    consulta = st.text_input(etiquetas["buscar"], placeholder="Ej.: laboratorio plazo")
+    if not consulta:
+        return
+    aciertos = buscar(consulta)
+    if not aciertos:
+        st.caption("Sin resultados en los documentos analizados.")
+    for acierto in aciertos:
+        with st.container(border=True):
+            st.markdown(f"**{acierto['nombre']}** — {acierto['asunto'] or 'Sin asunto'}")
+            st.caption(
+                f"{etiquetas['fecha']}{acierto['fecha_limite'] or 'Sin fecha'} · "
+                f"{etiquetas['responsable']}{acierto['responsable'] or 'Sin responsable'} · {acierto['origen']}"
+            )
+            st.markdown(acierto["fragmento"])
+    st.divider()
+
+
+def analizar_drive(motor, lectura_rapida, mostrar_resultado, etiquetas=ETIQUETAS, accion=None):
+    """Selector de los PDF listados de Drive, lanzamiento de su análisis y sus resultados."""
+    if "archivos_drive" not in st.session_state:
+        return
+    archivos = st.session_state.archivos_drive
+
+    if archivos:
+        # selector múltiple para elegir archivos a analizar
+        seleccionados = st.multiselect(
+            etiquetas["documentos_drive"],
+            archivos,
+            format_func=lambda x: x["name"],
+        )
+
+        if seleccionados and st.button(etiquetas["analizar_drive"], use_container_width=True):
+            if not st.session_state.get("credentials"):
+                st.warning("Debes iniciar sesión para descargar archivos de Drive.")
+            else:
+                # el análisis corre en segundo plano: la página sigue respondiendo
+                lanzar_trabajo(
+                    "trabajo_drive",
+                    f"{len(seleccionados)} documento(s) de Drive",
+                    FuenteDrive(
+                        st.session_state.get("credentials"),
+                        seleccionados,
+                        motor=motor,
+                        parada_temprana=lectura_rapida,
+                        presupuesto=st.session_state.presupuesto_memoria,
+                    ),
+                    motor,
+                    lectura_rapida,
+                    accion,
+                )
+
+    mostrar_trabajo("trabajo_drive", mostrar_resultado, etiquetas)
+
+
+def analizar_locales(pdfs, motor, lectura_rapida, mostrar_resultado, etiquetas=ETIQUETAS, accion=None):
+    """Análisis de los PDF subidos: se relanza solo si cambian los archivos o la opción de lectura.
+
+    En la sesión solo queda la firma (nombres y tamaños); los datos preparados
+    con el presupuesto pasan a la `FuenteSubidos` del trabajo, que los libera
+    al extraer cada texto o al cancelarse.
+    """
+    if not pdfs:
+        return
+    st.divider()
+    st.markdown(etiquetas["titulo_locales"])
+
+    firma = (tuple((pdf.name, pdf.size) for pdf in pdfs), lectura_rapida)
+    if st.session_state.get("firma_locales") != firma:
+        anterior = gestor_trabajos().obtener(st.session_state.get("trabajo_locales"))
+        if anterior is not None:
+            anterior.cancelar()
+            st.session_state.agendas.pop(anterior.id, None)  # ya no se muestra
+        presupuesto = st.session_state.presupuesto_memoria
+        lanzar_trabajo(
+            "trabajo_locales",
+            f"{len(pdfs)} PDF(s) locales",
+            FuenteSubidos([(pdf.name, presupuesto.preparar(pdf)) for pdf in pdfs], presupuesto),
+            motor,
+            lectura_rapida,
+            accion,
+        )
+        st.session_state.firma_locales = firma
+
+    mostrar_trabajo("trabajo_locales", mostrar_resultado, etiquetas)
+
+
+def panel_metricas(etiquetas=ETIQUETAS):
+    """Métricas por etapa de esta sesión (opcional), para la barra lateral."""
+    if not st.checkbox(etiquetas["metricas"], key="ver_metricas"):
+        return
+    filas = st.session_state.metricas_sesion.filas()
+    if filas:
+        st.dataframe(filas, hide_index=True, use_container_width=True)
+    else:
+        st.caption("Aún no hay mediciones en esta sesión.")
+    st.download_button(
+        "Exportar (Prometheus)",
+        metricas.exportar_prometheus(),
+        file_name="metricas.prom",
+        mime="text/plain",
+        use_container_width=True,
+    )
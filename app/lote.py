@@ -0,0 +1,274 @@
+"""Análisis de varios documentos en paralelo con un pool de procesos.
+
+La extracción con pypdf y las reglas consumen CPU, así que se reparten entre
+procesos. Los resultados se entregan en orden de finalización para poder
+mostrarlos en cuanto están listos.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import nullcontext
+from typing import Any, Callable, ContextManager, Dict, Iterable, Iterator, Optional, Tuple
+
+import metricas
+from memoria import Datos
+from procesamiento import buscar_en_cache, procesar_pdf
+
+# Segundos máximos de análisis por documento antes de darlo por fallido
+TIMEOUT_POR_DOCUMENTO = 120
+# Cada cuántos segundos se comprueba la cancelación mientras se espera a los procesos
+_INTERVALO_CANCELACION = 0.5
+# Segundos que un lote espera a la precarga en curso antes de crear el pool igualmente
+ESPERA_PRECARGA = 120
+
+# sin activar mientras corre `precargar_en_segundo_plano`: los pools esperan a que termine
+_PRECARGA_LISTA = threading.Event()
+_PRECARGA_LISTA.set()
+
+
+def workers_por_defecto(cantidad_docs: Optional[int] = None) -> int:
+    """Número de procesos razonable: uno por núcleo, sin superar la cantidad de documentos."""
+    workers = os.cpu_count() or 1
+    if cantidad_docs is not None:
+        workers = min(workers, max(cantidad_docs, 1))
+    return workers
+
+
+# Módulos que el forkserver importa una vez antes de crear procesos
+# (pypdf se importa de forma diferida en pdf_reader, así que va aparte)
+_PRECARGA_BASE = ("procesamiento", "pypdf")
+
+
+def _contexto_procesos():
+    # fork en un servidor con hilos (Streamlit) puede bloquearse; forkserver/spawn no
+    metodos = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in metodos else "spawn")
+
+
+def preparar_procesos(motor: str = "reglas") -> bool:
+    """Arranca el forkserver con los módulos del motor ya importados.
+
+    Con los motores "ia" e "hibrido" se precarga también el modelo de spaCy,
+    así los procesos del pool no lo cargan en el primer documento. Solo tiene
+    efecto si se llama antes del primer `analizar_lote` del proceso (desde un
+    hilo, usar `precargar_en_segundo_plano`) y la plataforma admite
+    forkserver; devuelve False en caso contrario (con spawn cada proceso
+    importa todo al arrancar).
+    """
+    contexto = _contexto_procesos()
+    if contexto.get_start_method() != "forkserver":
+        return False
+    precarga = _PRECARGA_BASE + (("precarga_ia",) if motor in ("ia", "hibrido") else ())
+    contexto.set_forkserver_preload(list(precarga))
+    from multiprocessing import forkserver
+
+    forkserver.ensure_running()
+    return True
+
+
+def precargar_en_segundo_plano(
+    motor: str = "reglas",
+    medir: Callable[[], ContextManager] = nullcontext,
+    nombre: str = "precarga-procesos",
+) -> threading.Thread:
+    """Lanza `preparar_procesos(motor)` en un hilo y devuelve el hilo sin esperarlo.
+
+    Los `analizar_lote` que lleguen mientras tanto esperan a que termine antes
+    de crear su pool: si lo crearan antes, el forkserver arrancaría sin los
+    módulos precargados. `medir()` envuelve la precarga (p. ej. una etapa de
+    `arranque`).
+    """
+    _PRECARGA_LISTA.clear()  # antes de arrancar el hilo: ningún pool se adelanta
+
+    def precargar():
+        try:
+            with medir():
+                preparar_procesos(motor)
+        except Exception as e:
+            print(f"Error al precargar los procesos: {e}")
+        finally:
+            _PRECARGA_LISTA.set()
+
+    hilo = threading.Thread(target=precargar, name=nombre, daemon=True)
+    hilo.start()
+    return hilo
+
+
+def _resultado(doc, procesado=None, error=None) -> Dict[str, Any]:
+    return {"doc": doc, "procesado": procesado, "error": error}
+
+
+class _ContextoRegistrado:
+    """Contexto de multiprocessing que anota cada proceso que crea el pool.
+
+    `ProcessPoolExecutor` no expone sus procesos; el pool los crea con
+    `mp_context.Process`, así que aquí quedan los que hay que matar.
+    """
+
+    def __init__(self, contexto):
+        self._contexto = contexto
+        self._lock = threading.Lock()
+        self.procesos = []
+
+    def Process(self, *args, **kwargs):
+        proceso = self._contexto.Process(*args, **kwargs)
+        with self._lock:
+            self.procesos.append(proceso)
+        return proceso
+
+    def __getattr__(self, nombre):
+        return getattr(self._contexto, nombre)
+
+
+def _terminar(pool: ProcessPoolExecutor, contexto: _ContextoRegistrado):
+    """Descarta el pool matando sus procesos: a uno colgado (p. ej. en pypdf) no se le puede pedir que pare."""
+    pool.shutdown(wait=False, cancel_futures=True)
+    with contexto._lock:
+        procesos = [proceso for proceso in contexto.procesos if proceso.pid is not None]
+    if not procesos:
+        print("No se encontraron procesos del pool que terminar")
+    for proceso in procesos:
+        proceso.terminate()
+    for proceso in procesos:
+        proceso.join()
+
+
+def analizar_lote(
+    docs: Iterable[Tuple[Any, Datos]],
+    workers: Optional[int] = None,
+    motor: str = "reglas",
+    timeout: Optional[float] = None,
+    parada_temprana: bool = False,
+    cancelar: Optional[threading.Event] = None,
+    liberar: Optional[Callable[[Datos], None]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Analiza los documentos `(doc, datos)` y devuelve resultados según terminan.
+
+    Cada resultado es un diccionario con `doc` (el identificador recibido, que no
+    sale del proceso principal), `procesado` (ver `procesar_pdf`) y `error`.
+    `workers` fija el número de procesos (por defecto uno por núcleo) y `timeout`
+    los segundos máximos por documento; un documento que lo supera se informa con
+    error "timeout", los procesos del pool se matan y se reemplazan, y los demás
+    documentos que estaban en curso se vuelven a enviar. Con un solo worker y sin
+    `timeout` el análisis corre en este mismo proceso. `parada_temprana` se pasa
+    a `procesar_pdf`. Los documentos que ya están en la caché se devuelven sin
+    pasar por el pool. Si se activa el evento `cancelar` el lote termina cuanto
+    antes, descartando lo que no empezó.
+
+    `datos` son los bytes del PDF o la ruta de un archivo (a los procesos solo
+    viaja la ruta). Si se indica, `liberar(datos)` se llama cuando el documento
+    ya no se necesita (ver `memoria.Presupuesto.liberar`).
+    """
+    workers = workers or workers_por_defecto()
+    docs = iter(docs)
+    liberar = liberar or (lambda datos: None)
+
+    if workers == 1 and not timeout:
+        # sin paralelismo ni límite de tiempo no compensa arrancar procesos
+        # (con `timeout` hace falta un proceso aparte para poder cortarlo)
+        for doc, datos in docs:
+            if cancelar is not None and cancelar.is_set():
+                return
+            try:
+                procesado = procesar_pdf(datos, motor, parada_temprana)
+            except Exception as e:
+                procesado, error = None, str(e)
+            else:
+                error = None
+            finally:
+                liberar(datos)
+            yield _resultado(doc, procesado, error)
+        return
+
+    def nuevo_pool():
+        if not _PRECARGA_LISTA.wait(ESPERA_PRECARGA):
+            print("La precarga de procesos no terminó a tiempo: el pool arranca sin esperarla")
+        contexto = _ContextoRegistrado(_contexto_procesos())
+        return ProcessPoolExecutor(max_workers=workers, mp_context=contexto), contexto
+
+    def enviar(datos):
+        # los tiempos del proceso hijo vuelven con el resultado (ver `metricas.reproducir`)
+        return pool.submit(procesar_pdf, datos, motor, parada_temprana, metricas.activo())
+
+    def limite_desde_ahora():
+        return time.monotonic() + timeout if timeout else None
+
+    pool, contexto = nuevo_pool()
+    pendientes = {}  # future -> (doc, datos, instante límite o None)
+    agotado = False
+    try:
+        while True:
+            if cancelar is not None and cancelar.is_set():
+                return
+
+            # mantengo como mucho `workers` documentos en vuelo
+            while not agotado and len(pendientes) < workers:
+                try:
+                    doc, datos = next(docs)
+                except StopIteration:
+                    agotado = True
+                    break
+                try:
+                    en_cache = buscar_en_cache(datos, motor, parada_temprana)
+                except OSError as e:  # una ruta que ya no se puede leer
+                    liberar(datos)
+                    yield _resultado(doc, error=str(e))
+                    continue
+                if en_cache is not None:
+                    liberar(datos)
+                    yield _resultado(doc, en_cache)
+                    continue
+                pendientes[enviar(datos)] = (doc, datos, limite_desde_ahora())
+
+            if not pendientes:
+                break
+
+            limites = [limite for _, _, limite in pendientes.values() if limite is not None]
+            espera = max(min(limites) - time.monotonic(), 0) if limites else None
+            if cancelar is not None:
+                # despierto de vez en cuando para atender la cancelación
+                espera = _INTERVALO_CANCELACION if espera is None else min(espera, _INTERVALO_CANCELACION)
+            hechos, _ = wait(list(pendientes), timeout=espera, return_when=FIRST_COMPLETED)
+
+            for future in hechos:
+                doc, datos, _ = pendientes.pop(future)
+                liberar(datos)
+                try:
+                    procesado = future.result()
+                except Exception as e:
+                    yield _resultado(doc, error=str(e))
+                    continue
+                metricas.reproducir(procesado.pop("tiempos", ()))
+                yield _resultado(doc, procesado)
+
+            ahora = time.monotonic()
+            vencidos = [
+                future for future, (_, _, limite) in pendientes.items()
+                if limite is not None and ahora >= limite and not future.done()
+            ]
+            if not vencidos:
+                continue
+            for future in vencidos:
+                doc, datos, _ = pendientes.pop(future)
+                liberar(datos)
+                yield _resultado(doc, error="timeout")
+            # el proceso colgado seguiría ocupando su lugar: cambio de pool y
+            # reenvío lo que estaba en curso (lo ya terminado conserva su resultado)
+            en_curso = [future for future in pendientes if not future.done()]
+            _terminar(pool, contexto)
+            pool, contexto = nuevo_pool()
+            for future in en_curso:
+                doc, datos, _ = pendientes.pop(future)
+                pendientes[enviar(datos)] = (doc, datos, limite_desde_ahora())
+    finally:
+        if any(not future.done() for future in pendientes):
+            _terminar(pool, contexto)  # cancelado: no dejo procesos trabajando para nadie
+        else:
+            pool.shutdown(wait=False, cancel_futures=True)
+        for _, datos, _ in pendientes.values():
+            liberar(datos)
@@ -1,20 +1,25 @@
+import arranque  # primero: el tiempo de arranque se mide desde aquí
+
 import streamlit as st  # interfaz web para la app
-from datetime import datetime  # para parsear fechas
 from auth_google import iniciar_login, procesar_callback, cargar_credenciales  # funciones de autenticación
-from pdf_reader import extraer_texto_pdf  # función para extraer texto de PDFs
-from drive_utils import listar_pdfs_drive, descargar_pdf_drive  # utilidades para Drive
-from calendar_utils import crear_evento_calendar, obtener_eventos_calendar  # función para crear eventos en Calendar
-
-from analyzer import (
-    buscar_palabras_clave,
-    buscar_fecha,
-    buscar_fecha_limite_doc,
-    calcular_fecha_limite,
-    buscar_asunto,
-    detectar_accion,
-    calcular_fecha_agenda,
+
+from lote import precargar_en_segundo_plano  # pool de procesos para el análisis
+from interfaz import (  # paneles compartidos con main_ai.py
+    analizar_drive,
+    analizar_locales,
+    opcion_lectura_rapida,
+    panel_busqueda,
+    panel_calendar,
+    panel_drive,
+    panel_metricas,
+    panel_subida,
+    preparar_sesion,
 )
 
+from analyzer import calcular_fecha_limite
+
+arranque.marcar("imports")
+
 # configuración básica de la página Streamlit
 st.set_page_config(
     page_title="Gestor Inteligente de Documentos",
@@ -36,6 +41,16 @@ st.caption(
 
 st.divider()  # separador visual
 
+
+
+@st.cache_resource(show_spinner=False)
+def precarga_procesos():
+    """Arranca el forkserver con pypdf y el analizador importados, una vez por proceso del servidor."""
+    return precargar_en_segundo_plano("reglas", medir=lambda: arranque.etapa("forkserver"))
+
+
+precarga_procesos()  # no espera: la página se pinta mientras tanto
+
 # proceso de callback / autenticación (si corresponde)
 procesar_callback()
 from auth_google import obtener_usuario  # importo aquí para evitar dependencias circulares
@@ -62,9 +77,8 @@ if st.session_state.get("just_logged_in"):
     # limpiamos la señal para evitar repeticiones
     st.session_state["just_logged_in"] = False
 
-# Aseguro que la clave `credentials` exista en la sesión (inicialmente None)
-st.session_state.setdefault("credentials", None)
-st.session_state.setdefault("eventos_creados", set())
+# valores por defecto de la sesión y métricas del rerun
+preparar_sesion()
 
 # Si no hay credenciales en sesión, intento cargarlas de archivo
 if not st.session_state.get("credentials"):
@@ -76,207 +90,73 @@ if not st.session_state.get("credentials"):
 if st.session_state.get("credentials") and "user_info" not in st.session_state:
     st.session_state.user_info = obtener_usuario(st.session_state.get("credentials"))
 
-# diseño de dos columnas en la UI
-col1, col2 = st.columns(2, gap="large")
-
-with col1:
-    st.subheader("📂 Fuentes de documentos")
-
-    with st.container(border=True):
-        st.markdown("### ☁️ Google Drive")
-        st.caption("Carga y analiza PDFs desde tu cuenta de Google")
 
-        # botón para listar PDFs desde Drive
-        if st.button("📥 Cargar PDFs desde Drive", use_container_width=True):
-            if not st.session_state.credentials:
-                st.warning("Debes iniciar sesión para acceder a Google Drive.")
+def mostrar_resultado(res):
+    """Muestra el análisis de un documento."""
+    nombre = res["nombre"]
+    with st.expander(f"📄 {nombre}"):
+        if res["error"]:
+            if res.get("descarga"):
+                st.error(f"No se pudo descargar {nombre}: {res['error']}")
             else:
-                with st.spinner("Conectando con Google Drive..."):
-                    st.session_state.archivos_drive = listar_pdfs_drive(
-                        st.session_state.get("credentials")
-                    )
-
-    with st.container(border=True):
-        st.markdown("### 📎 Subir desde tu equipo")
-        st.caption("Arrastra uno o varios documentos PDF")
-
-        # uploader para archivos locales (acepta múltiples)
-        pdfs = st.file_uploader(
-            "Selecciona archivos PDF",
-            type=["pdf"],
-            accept_multiple_files=True,
-            label_visibility="collapsed"
+                st.error(f"No se pudo analizar el documento: {res['error']}")
+            return
+
+        # texto del PDF y análisis de palabras clave y fechas (con caché)
+        procesado = res["procesado"]
+        texto = procesado["texto"]
+        analisis = procesado["resultado"]
+
+        palabras = analisis["palabras"]
+        fecha_detectada = analisis["fecha_detectada"]
+        fecha_limite = calcular_fecha_limite(fecha_detectada)
+
+        if res.get("sin_cambios"):
+            st.caption("♻️ Sin cambios desde el último análisis (no se volvió a descargar)")
+        if analisis.get("incompleto"):
+            st.warning("⏱️ El análisis se cortó por tiempo: el documento es muy largo y puede faltar información")
+
+        if not st.session_state.get("credentials"):
+            st.warning("Inicia sesión para crear eventos en Google Calendar.")
+
+        # muestro la fecha límite detectada
+        st.metric(
+            "📅 Fecha límite",
+            fecha_limite.strftime("%d/%m/%Y")
         )
 
-        st.session_state.pdfs_locales = pdfs  # guardo los PDFs subidos en la sesión
-    
-    # Sección de calendario
-    with st.container(border=True):
-        st.markdown("### 📅 Google Calendar")
-        st.caption("Eventos agendados y preparados")
-        
-        if st.session_state.get("credentials"):
-            st.success("✅ Conectado a Google Calendar")
-            
-            # Obtengo los eventos del calendario
-            eventos = obtener_eventos_calendar(st.session_state.get("credentials"), dias=30)
-            
-            if eventos:
-                st.markdown("#### 📌 Próximos eventos (30 días):")
-                
-                # Muestro los eventos en un formato visual
-                for evento in eventos:
-                    inicio = evento.get('start', {}).get('dateTime', evento.get('start', {}).get('date', 'N/A'))
-                    titulo = evento.get('summary', 'Sin título')
-                    descripcion = evento.get('description', '')[:100]  # primeros 100 caracteres
-                    
-                    # Parseo la fecha
-                    try:
-                        if 'T' in inicio:
-                            fecha_obj = datetime.fromisoformat(inicio.replace('Z', '+00:00'))
-                            fecha_formateada = fecha_obj.strftime("%d/%m/%Y %H:%M")
-                        else:
-                            fecha_formateada = inicio
-                    except:
-                        fecha_formateada = inicio
-                    
-                    # Muestro el evento en un contenedor expandible
-                    with st.expander(f"📋 {titulo} - {fecha_formateada}"):
-                        st.write(f"**Fecha:** {fecha_formateada}")
-                        if descripcion:
-                            st.write(f"**Detalles:** {descripcion}")
-                        # Enlace al evento en Google Calendar
-                        enlace = evento.get('htmlLink', '')
-                        if enlace:
-                            st.markdown(f"[🔗 Abrir en Google Calendar]({enlace})")
-            else:
-                st.info("📭 No hay eventos próximos en los próximos 30 días")
-        else:
-            st.warning("⏳ Inicia sesión para ver Google Calendar")
+        # otras fechas candidatas (ya calculadas en el análisis)
+        otras = [f.strftime("%d/%m/%Y") for f, _ in analisis["candidatos_fecha"][1:]]
+        if otras:
+            st.caption("Otras fechas posibles: " + ", ".join(otras))
 
-with col2:
-    st.subheader("🔍 Resultados del análisis")
+        # muestro palabras clave encontradas
+        st.write("🔑 Palabras clave encontradas:")
+        st.write(palabras or "Ninguna")
 
-    # sección para mostrar archivos obtenidos desde Drive
-    if "archivos_drive" in st.session_state:
-        archivos = st.session_state.archivos_drive
-
-        if archivos:
-            # selector múltiple para elegir archivos a analizar
-            seleccionados = st.multiselect(
-                "📄 Documentos desde Drive",
-                archivos,
-                format_func=lambda x: x["name"]
-            )
-
-            # botón para iniciar el análisis de los seleccionados
-            if seleccionados and st.button("⚙️ Analizar documentos de Drive", use_container_width=True):
-                for archivo in seleccionados:
-                    with st.expander(f"📄 {archivo['name']}"):
-                        # descargo el PDF desde Drive (verifico credenciales)
-                        if not st.session_state.get("credentials"):
-                            st.warning("Debes iniciar sesión para descargar archivos de Drive.")
-                            continue
-                        pdf_bytes = descargar_pdf_drive(
-                            st.session_state.get("credentials"),
-                            archivo["id"]
-                        )
-
-                        # extraigo texto del PDF
-                        texto = extraer_texto_pdf(pdf_bytes)
-
-                        # analizo palabras clave y fechas
-                        palabras = buscar_palabras_clave(texto)
-                        fecha_detectada = buscar_fecha_limite_doc(texto) or buscar_fecha(texto)
-                        asunto = buscar_asunto(texto)
-                        accion = detectar_accion(texto)
-                        fecha_limite = calcular_fecha_limite(fecha_detectada)
-                        fecha_agenda = calcular_fecha_agenda(fecha_detectada)
-
-                        evento_key = f"drive:{archivo['id']}"
-                        if evento_key not in st.session_state.eventos_creados:
-                            if not st.session_state.get("credentials"):
-                                st.warning("Inicia sesión para crear eventos en Google Calendar.")
-                            else:
-                                crear_evento_calendar(
-                                    st.session_state.get("credentials"),
-                                    titulo=f"{accion}: {asunto}" if asunto else f"{accion}: {archivo['name']}",
-                                    descripcion=(
-                                        f"Documento analizado: {archivo['name']}\n"
-                                        f"Asunto: {asunto if asunto else 'No detectado'}"
-                                    ),
-                                    fecha_limite=fecha_agenda,
-                                )
-                                st.session_state.eventos_creados.add(evento_key)
-                                st.success("Evento creado en tu Google Calendar")
-                        
-                        # botón para agendar el resultado en Calendar
-
-                        # muestro la fecha límite detectada
-                        st.metric(
-                            "📅 Fecha límite",
-                            fecha_limite.strftime("%d/%m/%Y")
-                        )
-
-                        # muestro palabras clave encontradas
-                        st.write("🔑 Palabras clave encontradas:")
-                        st.write(palabras or "Ninguna")
-
-                        # vista previa del texto extraído
-                        st.text_area(
-                            "Vista previa del texto",
-                            texto[:3000],
-                            height=180
-                        )
-
-    # sección para PDFs subidos localmente
-    if "pdfs_locales" in st.session_state and st.session_state.pdfs_locales:
-        st.divider()
-        st.markdown("### 📎 PDFs locales")
-
-        for pdf in st.session_state.pdfs_locales:
-            with st.expander(f"📄 {pdf.name}"):
-                texto = extraer_texto_pdf(pdf)  # extraigo texto del PDF local
-
-                palabras = buscar_palabras_clave(texto)
-                fecha_detectada = buscar_fecha_limite_doc(texto) or buscar_fecha(texto)
-                asunto = buscar_asunto(texto)
-                accion = detectar_accion(texto)
-                fecha_limite = calcular_fecha_limite(fecha_detectada)
-                fecha_agenda = calcular_fecha_agenda(fecha_detectada)
-
-                evento_key = f"local:{pdf.name}"
-                if evento_key not in st.session_state.eventos_creados:
-                    if not st.session_state.get("credentials"):
-                        st.warning("Inicia sesión para crear eventos en Google Calendar.")
-                    else:
-                        crear_evento_calendar(
-                            st.session_state.get("credentials"),
-                            titulo=f"{accion}: {asunto}" if asunto else f"{accion}: {pdf.name}",
-                            descripcion=(
-                                f"Documento analizado: {pdf.name}\n"
-                                f"Asunto: {asunto if asunto else 'No detectado'}"
-                            ),
-                            fecha_limite=fecha_agenda,
-                        )
-                        st.session_state.eventos_creados.add(evento_key)
-                        st.success("Evento creado en tu Google Calendar")
-                    
-
-                st.metric(
-                    "📅 Fecha límite",
-                    fecha_limite.strftime("%d/%m/%Y")
-                )
-
-                st.write("🔑 Palabras clave:", palabras or "Ninguna")
-
-                st.text_area(
-                    "Texto (vista previa)",
-                    texto[:3000],
-                    height=180
-                )
+        # vista previa del texto extraído
+        st.text_area(
+            "Vista previa del texto",
+            texto[:3000],
+            height=180
+        )
 
 
+# diseño de dos columnas en la UI
+col1, col2 = st.columns(2, gap="large")
+
+with col1:
+    st.subheader("📂 Fuentes de documentos")
+    panel_drive()
+    pdfs = panel_subida()
+    lectura_rapida = opcion_lectura_rapida()
+    panel_calendar()
+
+with col2:
+    st.subheader("🔍 Resultados del análisis")
+    panel_busqueda()
+    analizar_drive("reglas", lectura_rapida, mostrar_resultado)
+    analizar_locales(pdfs, "reglas", lectura_rapida, mostrar_resultado)
 
 # ───────────────── LOGIN ─────────────────
 if not st.session_state.get("credentials"):
@@ -311,10 +191,14 @@ with st.sidebar:
         # Botón para cerrar sesión
         if st.button("🔓 Cerrar sesión", use_container_width=True):
             from auth_google import eliminar_credenciales
-            eliminar_credenciales()
+            eliminar_credenciales(st.session_state.credentials)
             st.session_state.credentials = None
             st.session_state.user_info = None
             st.rerun()
     else:
         st.markdown("⏳ Google Calendar no configurado")
 
+    # Métricas por etapa de esta sesión (opcional)
+    panel_metricas()
+
+arranque.marcar("pagina_completa")
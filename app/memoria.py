@@ -0,0 +1,127 @@
+"""Límite de memoria para los PDF en bruto mientras esperan a ser analizados.
+
+Un documento viaja como `bytes` (en memoria) o como la ruta de un archivo
+temporal en disco. Los que superan `UMBRAL_DISCO`, o los que ya no caben en el
+presupuesto de la sesión (`Presupuesto`), se vuelcan a disco: pypdf los lee
+desde el archivo y a los procesos del lote solo se les envía la ruta. En
+cuanto se extrae el texto de un documento el presupuesto libera sus bytes (o
+borra su archivo temporal), así que una sesión no retiene los PDF originales.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from io import BytesIO
+from typing import Any, BinaryIO, Iterator, Union
+
+MB = 1024 * 1024
+# a partir de este tamaño un PDF se guarda en disco en vez de en memoria
+UMBRAL_DISCO = int(os.environ.get("GESTOR_UMBRAL_DISCO_MB", "16")) * MB
+# bytes de PDF que cada sesión puede tener en memoria a la vez
+PRESUPUESTO_SESION = int(os.environ.get("GESTOR_PRESUPUESTO_SESION_MB", "128")) * MB
+# tamaño de bloque al copiar un archivo a disco
+BLOQUE = 1 * MB
+
+# contenido de un PDF: los bytes o la ruta de un archivo
+Datos = Union[bytes, str]
+
+
+def archivo_temporal() -> BinaryIO:
+    """Abre un archivo temporal para escribir un PDF (lo borra `Presupuesto.liberar`)."""
+    return tempfile.NamedTemporaryFile(prefix="gestor-", suffix=".pdf", delete=False)
+
+
+def tamano_de(archivo) -> int:
+    """Tamaño en bytes de un `UploadedFile` o de un archivo abierto, sin leerlo."""
+    tamano = getattr(archivo, "size", None)
+    if tamano is not None:
+        return tamano
+    posicion = archivo.tell()
+    archivo.seek(0, os.SEEK_END)
+    tamano = archivo.tell()
+    archivo.seek(posicion)
+    return tamano
+
+
+@contextmanager
+def abrir(datos: Datos) -> Iterator[BinaryIO]:
+    """Flujo de lectura sobre el PDF: un buffer si son bytes, el archivo si es una ruta."""
+    if isinstance(datos, (bytes, bytearray)):
+        yield BytesIO(datos)
+    else:
+        with open(datos, "rb") as flujo:
+            yield flujo
+
+
+class Presupuesto:
+    """Cuenta los bytes de PDF que una sesión tiene en memoria y decide qué va a disco."""
+
+    def __init__(self, limite: int = PRESUPUESTO_SESION, umbral: int = UMBRAL_DISCO):
+        self.limite = limite
+        self.umbral = umbral
+        self.usado = 0
+        self._temporales = set()  # solo se borran los archivos creados aquí
+        self._lock = threading.Lock()
+
+    def reservar(self, tamano: int) -> bool:
+        """Reserva `tamano` bytes en memoria; False si el documento debe ir a disco."""
+        if tamano > self.umbral:
+            return False
+        with self._lock:
+            if self.usado + tamano > self.limite:
+                return False
+            self.usado += tamano
+            return True
+
+    def devolver(self, tamano: int):
+        """Libera `tamano` bytes reservados con `reservar`."""
+        with self._lock:
+            self.usado = max(self.usado - tamano, 0)
+
+    def destino(self, tamano: int) -> BinaryIO:
+        """Buffer donde descargar un PDF de `tamano` bytes: en memoria si cabe, si no en disco."""
+        return BytesIO() if self.reservar(tamano) else archivo_temporal()
+
+    def descartar(self, buffer: BinaryIO, tamano: int):
+        """Deshace `destino` cuando la descarga falló."""
+        if isinstance(buffer, BytesIO):
+            self.devolver(tamano)
+        else:
+            self.liberar(self.contenido(buffer))
+
+    def contenido(self, buffer: BinaryIO) -> Datos:
+        """Convierte el buffer de `destino` en `Datos`: bytes, o la ruta si está en disco."""
+        if isinstance(buffer, BytesIO):
+            return buffer.getvalue()
+        buffer.close()
+        with self._lock:
+            self._temporales.add(buffer.name)
+        return buffer.name
+
+    def preparar(self, archivo) -> Datos:
+        """Datos de un archivo subido: bytes si caben en el presupuesto, si no una copia en disco."""
+        archivo.seek(0)
+        if self.reservar(tamano_de(archivo)):
+            return archivo.read()
+        with archivo_temporal() as destino:
+            shutil.copyfileobj(archivo, destino, BLOQUE)
+        archivo.seek(0)
+        return self.contenido(destino)
+
+    def liberar(self, datos: Any):
+        """Devuelve al presupuesto los bytes de `datos` o borra su archivo temporal."""
+        if isinstance(datos, (bytes, bytearray)):
+            self.devolver(len(datos))
+            return
+        with self._lock:
+            if datos not in self._temporales:
+                return  # un archivo que no es nuestro (p. ej. los de la CLI)
+            self._temporales.discard(datos)
+        try:
+            os.remove(datos)
+        except OSError as e:
+            print(f"No se pudo borrar el temporal {datos}: {e}")
@@ -0,0 +1,241 @@
+"""Registro de métricas en proceso: tiempos por etapa y contadores.
+
+Las etapas (descarga de Drive, extracción del PDF, reglas, spaCy, Calendar) se
+miden con el decorador `instrumentar` o el contexto `medir`. Mientras las
+métricas están desactivadas ambos solo llaman a la función, sin tomar tiempos.
+Se activan para todo el proceso con la variable de entorno `GESTOR_METRICAS=1`
+o con `activar()` (CLI), o solo para una sesión con `usar_sesion(..., activa=True)`.
+
+Los tiempos van a un histograma por etapa (exportable en formato de texto de
+Prometheus o como JSONL) y, si el hilo tiene una sesión asociada
+(`usar_sesion`), también al resumen de esa sesión que muestra la barra lateral.
+Los procesos del lote no comparten este registro: capturan sus tiempos con
+`capturar()` y el proceso principal los vuelve a registrar con `reproducir()`.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# límites de los buckets del histograma, en segundos
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_activo = os.environ.get("GESTOR_METRICAS", "0") == "1"
+_LOCK = threading.Lock()
+_HISTOGRAMAS: Dict[str, "Histograma"] = {}
+_CONTADORES: Dict[Tuple[str, str], float] = {}  # (nombre, etapa) -> valor
+
+# resumen de la sesión de Streamlit del hilo actual
+_SESION: contextvars.ContextVar[Optional["Sesion"]] = contextvars.ContextVar("sesion", default=None)
+# métricas pedidas solo por la sesión del hilo actual (el resto del servidor no las paga)
+_ACTIVA_SESION: contextvars.ContextVar[bool] = contextvars.ContextVar("activa_sesion", default=False)
+# tiempos capturados en un proceso del lote para devolverlos al principal
+_CAPTURA: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("captura", default=None)
+
+
+class Histograma:
+    """Histograma acumulado (como los de Prometheus) de los tiempos de una etapa."""
+
+    def __init__(self):
+        self.cuentas = [0] * (len(BUCKETS) + 1)  # el último es +Inf
+        self.total = 0
+        self.suma = 0.0
+
+    def observar(self, segundos: float):
+        for i, limite in enumerate(BUCKETS):
+            if segundos <= limite:
+                break
+        else:
+            i = len(BUCKETS)
+        self.cuentas[i] += 1
+        self.total += 1
+        self.suma += segundos
+
+
+class Sesion:
+    """Resumen por etapa de los tiempos de una sesión: llamadas, total y máximo."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.etapas: Dict[str, List[float]] = {}  # etapa -> [llamadas, total, máximo]
+
+    def observar(self, etapa: str, segundos: float):
+        with self._lock:
+            datos = self.etapas.setdefault(etapa, [0, 0.0, 0.0])
+            datos[0] += 1
+            datos[1] += segundos
+            datos[2] = max(datos[2], segundos)
+
+    def filas(self) -> List[Dict[str, object]]:
+        """Filas para mostrar en una tabla, de la etapa más costosa a la menos."""
+        with self._lock:
+            copia = {etapa: list(datos) for etapa, datos in self.etapas.items()}
+        return [
+            {
+                "etapa": etapa,
+                "llamadas": llamadas,
+                "media_ms": round(total / llamadas * 1000, 1),
+                "max_ms": round(maximo * 1000, 1),
+                "total_s": round(total, 2),
+            }
+            for etapa, (llamadas, total, maximo) in sorted(
+                copia.items(), key=lambda item: -item[1][1]
+            )
+        ]
+
+
+def activo() -> bool:
+    return _activo or _ACTIVA_SESION.get()
+
+
+def activar(valor: bool = True):
+    """Activa (o desactiva) las métricas para todo el proceso."""
+    global _activo
+    _activo = valor
+
+
+def usar_sesion(sesion: Optional[Sesion], activa: bool = False):
+    """Asocia al hilo (y a lo que se lance desde él con su contexto) el resumen de una sesión.
+
+    Con `activa` las métricas se toman solo en este contexto, aunque estén
+    desactivadas para el proceso.
+    """
+    _SESION.set(sesion)
+    _ACTIVA_SESION.set(activa)
+
+
+def registrar(etapa: str, segundos: float):
+    """Añade una medición de `etapa` al registro, a la sesión y a la captura en curso."""
+    captura = _CAPTURA.get()
+    if captura is not None:
+        captura.append((etapa, segundos))
+    if not activo():
+        return
+    with _LOCK:
+        histograma = _HISTOGRAMAS.get(etapa)
+        if histograma is None:
+            histograma = _HISTOGRAMAS[etapa] = Histograma()
+        histograma.observar(segundos)
+    sesion = _SESION.get()
+    if sesion is not None:
+        sesion.observar(etapa, segundos)
+
+
+def contar(nombre: str, etapa: str = "", valor: float = 1):
+    """Incrementa el contador `nombre` (p. ej. aciertos de caché) para `etapa`."""
+    if not activo():
+        return
+    with _LOCK:
+        _CONTADORES[(nombre, etapa)] = _CONTADORES.get((nombre, etapa), 0) + valor
+
+
+@contextmanager
+def medir(etapa: str):
+    """Mide el bloque como una ejecución de `etapa`; los errores se cuentan aparte."""
+    if not activo() and _CAPTURA.get() is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        contar("errores", etapa)
+        raise
+    finally:
+        registrar(etapa, time.perf_counter() - inicio)
+
+
+def instrumentar(etapa: str):
+    """Decorador que mide cada llamada a la función como `etapa`."""
+
+    def decorador(funcion):
+        @wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if not activo() and _CAPTURA.get() is None:
+                return funcion(*args, **kwargs)
+            with medir(etapa):
+                return funcion(*args, **kwargs)
+
+        return envoltura
+
+    return decorador
+
+
+@contextmanager
+def capturar():
+    """Recoge en una lista los tiempos medidos dentro del bloque, aunque el registro esté apagado."""
+    tiempos: List[Tuple[str, float]] = []
+    token = _CAPTURA.set(tiempos)
+    try:
+        yield tiempos
+    finally:
+        _CAPTURA.reset(token)
+
+
+def reproducir(tiempos: Iterable[Tuple[str, float]]):
+    """Registra en este proceso los tiempos capturados en otro (ver `capturar`)."""
+    for etapa, segundos in tiempos:
+        registrar(etapa, segundos)
+
+
+def instantanea() -> Dict[str, object]:
+    """Copia del estado del registro, serializable en JSON."""
+    with _LOCK:
+        return {
+            "histogramas": {
+                etapa: {"cuentas": list(h.cuentas), "total": h.total, "suma": h.suma}
+                for etapa, h in _HISTOGRAMAS.items()
+            },
+            "contadores": [
+                {"nombre": nombre, "etapa": etapa, "valor": valor}
+                for (nombre, etapa), valor in _CONTADORES.items()
+            ],
+        }
+
+
+def exportar_prometheus() -> str:
+    """Devuelve el registro en el formato de texto de exposición de Prometheus."""
+    datos = instantanea()
+    lineas = [
+        "# HELP gestor_etapa_segundos Duración de cada etapa del procesamiento.",
+        "# TYPE gestor_etapa_segundos histogram",
+    ]
+    for etapa, h in sorted(datos["histogramas"].items()):
+        acumulado = 0
+        for limite, cuenta in zip(BUCKETS + ("+Inf",), h["cuentas"]):
+            acumulado += cuenta
+            lineas.append(f'gestor_etapa_segundos_bucket{{etapa="{etapa}",le="{limite}"}} {acumulado}')
+        lineas.append(f'gestor_etapa_segundos_sum{{etapa="{etapa}"}} {h["suma"]}')
+        lineas.append(f'gestor_etapa_segundos_count{{etapa="{etapa}"}} {h["total"]}')
+
+    nombres = sorted({c["nombre"] for c in datos["contadores"]})
+    for nombre in nombres:
+        lineas.append(f"# TYPE gestor_{nombre}_total counter")
+        for c in datos["contadores"]:
+            if c["nombre"] == nombre:
+                lineas.append(f'gestor_{nombre}_total{{etapa="{c["etapa"]}"}} {c["valor"]}')
+    return "\n".join(lineas) + "\n"
+
+
+def exportar_jsonl(ruta: str):
+    """Añade a `ruta` una línea JSON con la marca de tiempo y la instantánea actual."""
+    linea = json.dumps({"ts": time.time(), **instantanea()}, ensure_ascii=False)
+    try:
+        with open(ruta, "a", encoding="utf-8") as f:
+            f.write(linea + "\n")
+    except OSError as e:
+        print(f"Error al exportar métricas: {e}")
+
+
+def reiniciar():
+    """Vacía el registro (útil en benchmarks)."""
+    with _LOCK:
+        _HISTOGRAMAS.clear()
+        _CONTADORES.clear()
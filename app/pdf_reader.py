@@ -1,13 +1,38 @@
-from pypdf import PdfReader  # lector de PDFs
+from analyzer import tiene_asunto_y_fecha  # detección barata para la parada temprana
+from metricas import instrumentar  # tiempos por etapa
 
 
-def extraer_texto_pdf(file):
-    # creo un lector de PDF a partir del archivo/puntero pasado
-    reader = PdfReader(file)
-    texto = ""  # acumulador de texto extraído
+def iterar_paginas(file):
+    """Genera (número de página, texto) perezosamente, extrayendo cada página una sola vez."""
+    from pypdf import PdfReader  # lector de PDFs (se importa al usarlo por primera vez)
 
-    for page in reader.pages:  # itero por cada página del PDF
-        if page.extract_text():  # si la página tiene texto extraíble
-            texto += page.extract_text() + "\n"  # lo añado al acumulador
+    reader = PdfReader(file)  # creo un lector de PDF a partir del archivo/puntero pasado
 
-    return texto  # devuelvo el texto completo extraído
+    for numero, page in enumerate(reader.pages, start=1):  # itero por cada página del PDF
+        texto = page.extract_text()
+        if texto:  # si la página tiene texto extraíble
+            yield numero, texto
+
+
+@instrumentar("extraer_texto_pdf")
+def extraer_texto_pdf(file, parada_temprana=False):
+    """Extrae el texto del PDF.
+
+    Con `parada_temprana` deja de leer en cuanto se han visto la línea de asunto
+    y una fecha precedida de palabra clave (en los memos suelen estar en la
+    página 1 o 2), lo que evita recorrer anexos largos.
+    """
+    partes = []  # acumulo las páginas y las uno al final
+    hay_asunto = hay_fecha = False
+
+    for _, texto_pagina in iterar_paginas(file):
+        partes.append(texto_pagina + "\n")
+
+        if parada_temprana:
+            asunto, fecha = tiene_asunto_y_fecha(texto_pagina)
+            hay_asunto = hay_asunto or asunto
+            hay_fecha = hay_fecha or fecha
+            if hay_asunto and hay_fecha:
+                break
+
+    return "".join(partes)  # devuelvo el texto extraído
@@ -0,0 +1,476 @@
+"""Flujo de documentos por etapas: fuente → análisis → destinos.
+
+- Fuente (`FuenteSubidos`, `FuenteDrive`, `FuenteArchivos`): produce pares
+  (doc, datos). Corre en su propio hilo; la de Drive descarga en paralelo y se
+  salta los archivos que no cambiaron (manifiesto).
+- Análisis: `lote.analizar_lote`, que extrae el texto y aplica el motor
+  elegido ("reglas", "ia", "hibrido") en un pool de procesos, con la caché.
+- Destinos (`DestinoIndice`, `DestinoAgenda`): reciben cada resultado en otro
+  hilo (índice de búsqueda, eventos de Calendar...).
+
+Las etapas se conectan con colas acotadas: si el análisis va más lento que la
+fuente, la fuente espera y no se acumulan PDFs en memoria; si los destinos se
+retrasan, el análisis espera. Así la red, la CPU y las escrituras en disco se
+solapan. Cada etapa se mide con `metricas` (`fuente_<tipo>`, las etapas del
+análisis y `destino_<nombre>`).
+
+Lo usan los trabajos de las dos interfaces (`trabajos.tarea_pipeline`) y la CLI.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import os
+import queue
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import metricas
+from cache_documentos import guardar_manifiesto, leer_manifiesto
+from calendar_utils import crear_eventos_calendar
+from descargas import descargar_lote
+from drive_utils import version_archivo
+from google_clients import canal_prestado
+from indice import indexar
+from lote import TIMEOUT_POR_DOCUMENTO, analizar_lote, workers_por_defecto
+from memoria import Datos, Presupuesto
+from procesamiento import buscar_por_hash
+
+# documentos (o resultados) que puede haber esperando entre dos etapas
+TAMANO_COLA = 8
+# cada cuántos segundos una etapa bloqueada comprueba si debe parar
+_ESPERA = 0.1
+
+_FIN = object()  # marca de fin de una cola
+
+
+class _Fallo:
+    """Excepción de una etapa, para volver a lanzarla en la que consume."""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class Fuente(ABC):
+    """Origen de los documentos de un flujo; las subclases implementan `origen` y `documentos`."""
+
+    tipo = "fuente"
+
+    def __init__(self, total: int):
+        self.total = total
+        # resultados con error que la fuente produce al generar (p. ej. descargas fallidas)
+        self.fallidos: deque = deque()
+
+    @abstractmethod
+    def origen(self, doc) -> str:
+        """Identificador estable del documento ("drive:<id>", "local:<nombre>"...)."""
+
+    def nombre(self, doc) -> str:
+        return str(doc)
+
+    def resueltos(self) -> List[Dict[str, Any]]:
+        """Resultados que no hace falta analizar; se entregan antes que los demás."""
+        return []
+
+    @abstractmethod
+    def documentos(self, cancelar: Optional[threading.Event]) -> Iterator[Tuple[Any, Datos]]:
+        """Genera los pares (doc, datos) a analizar; debe parar si se activa `cancelar`."""
+
+    def al_analizar(self, resultado: Dict[str, Any]):
+        """Se llama (en el hilo de los destinos) con cada resultado."""
+
+    def liberar(self, datos: Datos):
+        """Suelta los datos de un documento que ya no se necesita."""
+
+    def cerrar(self):
+        """Suelta lo que la fuente aún retiene (documentos que no llegaron a entregarse).
+
+        Se llama al terminar el flujo y también si el trabajo se cancela antes de
+        empezar; puede llamarse más de una vez.
+        """
+
+
+class FuenteSubidos(Fuente):
+    """Documentos subidos desde la interfaz, como pares (nombre, datos)."""
+
+    tipo = "subidos"
+
+    def __init__(self, docs: Sequence[Tuple[str, Datos]], presupuesto: Optional[Presupuesto] = None):
+        super().__init__(len(docs))
+        # cada documento sale de la cola al entregarlo: no se retienen los ya analizados
+        self._cola = deque(docs)
+        self.presupuesto = presupuesto if presupuesto is not None else Presupuesto()
+
+    def origen(self, doc) -> str:
+        return f"local:{doc}"
+
+    def documentos(self, cancelar):
+        try:
+            while self._cola and not (cancelar is not None and cancelar.is_set()):
+                yield self._cola.popleft()
+        finally:
+            self.cerrar()
+
+    def liberar(self, datos):
+        self.presupuesto.liberar(datos)
+
+    def cerrar(self):
+        while self._cola:  # cancelado: libero lo que no llegó a analizarse
+            try:
+                _, datos = self._cola.popleft()
+            except IndexError:  # otro hilo se llevó el último
+                return
+            self.presupuesto.liberar(datos)
+
+
+class FuenteDrive(Fuente):
+    """Archivos de Drive: descarga concurrente de los que cambiaron desde su último análisis.
+
+    Los archivos cuya versión (md5Checksum/modifiedTime) ya se analizó no se
+    descargan: se entrega el resultado guardado, con la marca `sin_cambios`.
+    Un archivo que no se pudo descargar se informa como resultado con `error`
+    y la marca `descarga`. Los PDF que no caben en `presupuesto` se descargan
+    a disco.
+    """
+
+    tipo = "drive"
+
+    def __init__(
+        self,
+        credentials,
+        archivos: List[Dict[str, Any]],
+        motor: str = "reglas",
+        parada_temprana: bool = False,
+        presupuesto: Optional[Presupuesto] = None,
+    ):
+        super().__init__(len(archivos))
+        self.credentials = credentials
+        self.archivos = archivos
+        self.motor = motor
+        self.parada_temprana = parada_temprana
+        self.presupuesto = presupuesto if presupuesto is not None else Presupuesto()
+        self._pendientes = list(archivos)
+
+    def origen(self, doc) -> str:
+        return f"drive:{doc['id']}"
+
+    def nombre(self, doc) -> str:
+        return doc["name"]
+
+    def resueltos(self):
+        reutilizados, self._pendientes = [], []
+        for archivo in self.archivos:
+            version = version_archivo(archivo)
+            hash_pdf = leer_manifiesto(archivo["id"], version) if version else None
+            procesado = buscar_por_hash(hash_pdf, self.motor, self.parada_temprana) if hash_pdf else None
+            if procesado is None:
+                self._pendientes.append(archivo)
+            else:
+                reutilizados.append({"doc": archivo, "procesado": procesado, "error": None, "sin_cambios": True})
+        return reutilizados
+
+    def documentos(self, cancelar):
+        if not self._pendientes:
+            return
+        for archivo, buffer, error in descargar_lote(
+            self.credentials, self._pendientes, presupuesto=self.presupuesto
+        ):
+            if error:
+                self.fallidos.append({"doc": archivo, "procesado": None, "error": error, "descarga": True})
+                continue
+            datos = self.presupuesto.contenido(buffer)
+            if cancelar is not None and cancelar.is_set():
+                self.presupuesto.liberar(datos)
+                return
+            yield archivo, datos
+
+    def al_analizar(self, resultado):
+        archivo, procesado = resultado["doc"], resultado["procesado"]
+        version = version_archivo(archivo)
+        if procesado and not resultado["error"] and version and not resultado.get("sin_cambios"):
+            guardar_manifiesto(archivo["id"], version, procesado["hash"])
+
+    def liberar(self, datos):
+        self.presupuesto.liberar(datos)
+
+
+class FuenteArchivos(Fuente):
+    """Rutas de PDF en disco (CLI): a los procesos solo viaja la ruta."""
+
+    tipo = "archivos"
+
+    def __init__(self, rutas: Sequence[str]):
+        super().__init__(len(rutas))
+        self.rutas = rutas
+
+    def origen(self, doc) -> str:
+        return f"archivo:{os.path.abspath(doc)}"
+
+    def nombre(self, doc) -> str:
+        return os.path.basename(doc)
+
+    def documentos(self, cancelar):
+        for ruta in self.rutas:
+            if cancelar is not None and cancelar.is_set():
+                return
+            yield ruta, ruta
+
+
+def exitoso(resultado: Dict[str, Any]) -> bool:
+    """Indica si el documento se analizó sin errores (ni de descarga ni del motor)."""
+    procesado = resultado["procesado"]
+    return not resultado["error"] and bool(procesado) and not procesado["resultado"].get("error")
+
+
+class Destino(ABC):
+    """Etapa final: recibe cada resultado y, al terminar el flujo, `cerrar()`."""
+
+    etapa = "destino"
+
+    @abstractmethod
+    def recibir(self, resultado: Dict[str, Any]):
+        """Procesa un resultado (en el hilo de los destinos)."""
+
+    def cerrar(self, cancelado: bool = False):
+        """Se llama una vez al terminar el flujo; `cancelado` indica si se canceló."""
+
+
+class DestinoIndice(Destino):
+    """Agrega al índice de búsqueda cada documento analizado sin error."""
+
+    etapa = "destino_indice"
+
+    def __init__(self, motor: str = "reglas"):
+        self.motor = motor
+
+    def recibir(self, resultado):
+        if exitoso(resultado):
+            procesado = resultado["procesado"]
+            indexar(
+                resultado["origen"],
+                resultado["nombre"],
+                procesado["texto"],
+                procesado["resultado"],
+                procesado["hash"],
+                self.motor,
+            )
+
+
+class DestinoAgenda(Destino):
+    """Crea en Calendar, en un solo lote al terminar, los eventos de los documentos analizados.
+
+    `datos_evento(resultado)` devuelve los datos del evento (ver
+    `calendar_utils.crear_eventos_calendar`) o None si el documento no lleva
+    evento. Al cerrar quedan en `resultados` ({origen: {"enlace", "error",
+    "existente"}}) o, si falló todo el lote, en `error`; `nombres` traduce
+    cada origen al nombre del documento. Si el flujo se canceló no se crea
+    ningún evento (`cancelado`).
+
+    Corre en el hilo de los destinos, así que usa su propio canal HTTP: el
+    servicio de Calendar del canal 0 lo usa la interfaz a la vez.
+    """
+
+    etapa = "destino_agenda"
+
+    def __init__(self, credentials, datos_evento: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]):
+        self.credentials = credentials
+        self.datos_evento = datos_evento
+        self.pendientes: List[Tuple[str, Dict[str, Any]]] = []
+        self.nombres: Dict[str, str] = {}
+        self.resultados: Optional[Dict[str, Dict[str, Any]]] = None
+        self.error: Optional[str] = None
+        self.cancelado = False
+
+    @property
+    def terminado(self) -> bool:
+        return self.resultados is not None or self.error is not None
+
+    def recibir(self, resultado):
+        if not exitoso(resultado):
+            return
+        datos = self.datos_evento(resultado)
+        if datos is not None:
+            self.pendientes.append((resultado["origen"], datos))
+            self.nombres[resultado["origen"]] = resultado["nombre"]
+
+    def cerrar(self, cancelado=False):
+        self.cancelado = cancelado
+        if cancelado or not self.pendientes:
+            self.resultados = {}
+            return
+        try:
+            with canal_prestado(self.credentials, "agenda") as canal:
+                self.resultados = crear_eventos_calendar(self.credentials, self.pendientes, canal=canal)
+        except Exception as e:
+            self.error = str(e)
+            print(f"Error al crear los eventos: {e}")
+
+
+def _en_hilo(
+    nombre: str,
+    producir: Callable[[], Iterable[Any]],
+    tamano: int,
+    etapa: str,
+    descartar: Callable[[Any], None],
+) -> Iterator[Any]:
+    """Ejecuta `producir` en un hilo y entrega sus elementos a través de una cola acotada.
+
+    Cuando la cola está llena el productor espera (contrapresión). Si quien
+    consume deja de hacerlo, el productor para y `descartar` recibe los
+    elementos que quedaron sin entregar.
+    """
+    cola: queue.Queue = queue.Queue(maxsize=tamano)
+    parada = threading.Event()
+
+    def poner(item) -> bool:
+        while not parada.is_set():
+            try:
+                cola.put(item, timeout=_ESPERA)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def vaciar():
+        while True:
+            try:
+                item = cola.get_nowait()
+            except queue.Empty:
+                return
+            if item is not _FIN and not isinstance(item, _Fallo):
+                descartar(item)
+
+    def correr():
+        iterador = iter(producir())
+        try:
+            while True:
+                with metricas.medir(etapa):
+                    item = next(iterador, _FIN)
+                if item is _FIN:
+                    break
+                if not poner(item):
+                    descartar(item)
+                    break
+        except Exception as e:
+            poner(_Fallo(e))
+        finally:
+            if hasattr(iterador, "close"):
+                iterador.close()
+            poner(_FIN)
+            if parada.is_set():
+                vaciar()  # lo que se puso mientras el consumidor se iba
+
+    # con el contexto de quien lo lanza, para que las métricas lleguen a su sesión
+    hilo = threading.Thread(target=contextvars.copy_context().run, args=(correr,), name=nombre, daemon=True)
+    hilo.start()
+    try:
+        while True:
+            item = cola.get()
+            if item is _FIN:
+                return
+            if isinstance(item, _Fallo):
+                raise item.error
+            yield item
+    finally:
+        parada.set()
+        vaciar()
+
+
+def _aplicar_destinos(
+    fuente: Fuente, destinos: List[Destino], cola: queue.Queue, cancelar: Optional[threading.Event]
+):
+    """Hilo de los destinos: entrega cada resultado a todos y los cierra al final."""
+    while True:
+        resultado = cola.get()
+        if resultado is _FIN:
+            break
+        try:
+            fuente.al_analizar(resultado)
+        except Exception as e:
+            print(f"Error al registrar {resultado['origen']}: {e}")
+        for destino in destinos:
+            try:
+                with metricas.medir(destino.etapa):
+                    destino.recibir(resultado)
+            except Exception as e:
+                print(f"Error en {destino.etapa} con {resultado['origen']}: {e}")
+    cancelado = cancelar is not None and cancelar.is_set()
+    for destino in destinos:
+        try:
+            with metricas.medir(destino.etapa):
+                destino.cerrar(cancelado)
+        except Exception as e:
+            print(f"Error al cerrar {destino.etapa}: {e}")
+
+
+def ejecutar(
+    fuente: Fuente,
+    motor: str = "reglas",
+    parada_temprana: bool = False,
+    destinos: Iterable[Destino] = (),
+    cancelar: Optional[threading.Event] = None,
+    workers: Optional[int] = None,
+    timeout: Optional[float] = TIMEOUT_POR_DOCUMENTO,
+    tamano_cola: int = TAMANO_COLA,
+) -> Iterator[Dict[str, Any]]:
+    """Pasa los documentos de `fuente` por el análisis y los `destinos`, y entrega cada resultado.
+
+    Los resultados tienen la forma de `lote.analizar_lote` más `origen` y
+    `nombre` (según la fuente), y se entregan en cuanto terminan; los destinos
+    los procesan en paralelo. El flujo acaba cuando los destinos han cerrado.
+    `cancelar` detiene la fuente y el análisis cuanto antes.
+    """
+    destinos = list(destinos)
+    cola_destinos: queue.Queue = queue.Queue(maxsize=tamano_cola)
+    hilo_destinos = threading.Thread(
+        target=contextvars.copy_context().run,
+        args=(_aplicar_destinos, fuente, destinos, cola_destinos, cancelar),
+        name=f"destinos-{fuente.tipo}",
+        daemon=True,
+    )
+    hilo_destinos.start()
+
+    def entregar(resultado):
+        resultado["origen"] = fuente.origen(resultado["doc"])
+        resultado["nombre"] = fuente.nombre(resultado["doc"])
+        cola_destinos.put(resultado)  # espera si los destinos van atrasados
+        return resultado
+
+    entrada = resultados = None
+    try:
+        for resultado in fuente.resueltos():
+            yield entregar(resultado)
+
+        entrada = _en_hilo(
+            f"fuente-{fuente.tipo}",
+            lambda: fuente.documentos(cancelar),
+            tamano_cola,
+            etapa=f"fuente_{fuente.tipo}",
+            descartar=lambda doc: fuente.liberar(doc[1]),
+        )
+        resultados = analizar_lote(
+            entrada,
+            workers=workers or workers_por_defecto(fuente.total),
+            motor=motor,
+            timeout=timeout,
+            parada_temprana=parada_temprana,
+            cancelar=cancelar,
+            liberar=fuente.liberar,
+        )
+        for resultado in resultados:
+            while fuente.fallidos:
+                yield entregar(fuente.fallidos.popleft())
+            yield entregar(resultado)
+        while fuente.fallidos:
+            yield entregar(fuente.fallidos.popleft())
+    finally:
+        # cierro en orden: el análisis (libera el pool) y luego la fuente
+        if resultados is not None:
+            resultados.close()
+        if entrada is not None:
+            entrada.close()
+        fuente.cerrar()
+        cola_destinos.put(_FIN)
+        hilo_destinos.join()
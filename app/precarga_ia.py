@@ -0,0 +1,11 @@
+"""Importar este módulo carga el modelo de spaCy.
+
+Lo usa `lote.preparar_procesos` como módulo de precarga del forkserver: los
+procesos del pool nacen ya con el modelo en memoria (compartida por
+copy-on-write) en lugar de cargarlo en el primer documento.
+"""
+
+from ai_extractor import precargar_modelo
+
+if not precargar_modelo():
+    print("Modelo es_core_news_sm no disponible: se omite la precarga")
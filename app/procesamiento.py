@@ -0,0 +1,117 @@
+"""Extracción de texto + análisis de un PDF, reutilizando la caché persistente.
+
+Los motores disponibles son "reglas" (módulo `analyzer`), "ia" (`ai_extractor`)
+e "hibrido" (`hibrido`: reglas primero y spaCy solo para lo que falte). Los
+motores con IA se importan solo cuando se usan para no cargar spaCy sin necesidad.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Optional
+
+from analyzer import VERSION_ANALIZADOR, analizar_documento
+import metricas
+from cache_documentos import calcular_hash, guardar_cache, leer_cache
+from memoria import Datos, abrir
+from pdf_reader import extraer_texto_pdf
+
+
+def _motor_reglas():
+    return VERSION_ANALIZADOR, analizar_documento
+
+
+def _motor_ia():
+    from ai_extractor import VERSION_IA, analizar_documento_ia
+    return VERSION_IA, analizar_documento_ia
+
+
+def _motor_hibrido():
+    from hibrido import VERSION_HIBRIDO, analizar_documento_hibrido
+    return VERSION_HIBRIDO, analizar_documento_hibrido
+
+
+MOTORES = {
+    "reglas": _motor_reglas,
+    "ia": _motor_ia,
+    "hibrido": _motor_hibrido,
+}
+
+
+def leer_bytes(archivo) -> bytes:
+    """Devuelve el contenido binario de un `UploadedFile` o de un buffer descargado."""
+    if hasattr(archivo, "getvalue"):
+        return archivo.getvalue()
+    archivo.seek(0)
+    return archivo.read()
+
+
+def _version(motor: str, parada_temprana: bool) -> str:
+    version, _ = MOTORES[motor]()
+    # la lectura parcial da otro texto, así que no comparte entradas de caché
+    return f"{version}+rapida" if parada_temprana else version
+
+
+def buscar_en_cache(
+    datos: Datos, motor: str = "reglas", parada_temprana: bool = False
+) -> Optional[Dict[str, Any]]:
+    """Devuelve el documento ya procesado si está en la caché, o None."""
+    return buscar_por_hash(calcular_hash(datos), motor, parada_temprana)
+
+
+def buscar_por_hash(
+    hash_pdf: str, motor: str = "reglas", parada_temprana: bool = False
+) -> Optional[Dict[str, Any]]:
+    """Como `buscar_en_cache` pero con el hash ya conocido (p. ej. por el manifiesto de Drive)."""
+    version = _version(motor, parada_temprana)
+    en_cache = leer_cache(hash_pdf, version)
+    if en_cache is None:
+        return None
+    metricas.contar("cache_aciertos", motor)
+    return {**en_cache, "hash": hash_pdf, "desde_cache": True}
+
+
+def procesar_pdf(
+    datos: Datos,
+    motor: str = "reglas",
+    parada_temprana: bool = False,
+    capturar_tiempos: bool = False,
+) -> Dict[str, Any]:
+    """Extrae el texto del PDF (bytes o ruta de archivo) y lo analiza con `motor`.
+
+    Con `parada_temprana` solo se leen las páginas necesarias para encontrar el
+    asunto y la fecha límite (ver `extraer_texto_pdf`). Devuelve un diccionario
+    con `texto`, `resultado`, `hash` y `desde_cache`. Los resultados con error
+    (p. ej. modelo de spaCy ausente) o `incompleto` (escaneo cortado por
+    tiempo, o IA necesaria pero no disponible) no se guardan. Con
+    `capturar_tiempos` se añade `tiempos`, la lista de (etapa, segundos)
+    medidos, para registrarlos en otro proceso con `metricas.reproducir`.
+    """
+    if capturar_tiempos:
+        with metricas.capturar() as tiempos:
+            procesado = procesar_pdf(datos, motor, parada_temprana)
+        return {**procesado, "tiempos": tiempos}
+
+    _, analizar = MOTORES[motor]()
+    version = _version(motor, parada_temprana)
+    hash_pdf = calcular_hash(datos)
+
+    en_cache = leer_cache(hash_pdf, version)
+    if en_cache is not None:
+        metricas.contar("cache_aciertos", motor)
+        return {**en_cache, "hash": hash_pdf, "desde_cache": True}
+    metricas.contar("cache_fallos", motor)
+
+    with abrir(datos) as flujo:  # una ruta se lee desde disco, sin copiarla a memoria
+        texto = extraer_texto_pdf(flujo, parada_temprana=parada_temprana)
+    resultado = analizar(texto)
+    if resultado.get("incompleto"):  # no guardo un análisis cortado por tiempo
+        metricas.contar("analisis_incompleto", motor)
+    elif not resultado.get("error"):
+        guardar_cache(hash_pdf, version, texto, resultado)
+
+    return {
+        "texto": texto,
+        "resultado": resultado,
+        "hash": hash_pdf,
+        "desde_cache": False,
+    }
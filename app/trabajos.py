@@ -0,0 +1,147 @@
+"""Trabajos de análisis en segundo plano, fuera de la ejecución del script.
+
+Streamlit vuelve a ejecutar el script con cada interacción; si el análisis
+corre dentro del script, cualquier clic lo interrumpe o lo repite. Aquí un
+`GestorTrabajos` (uno por proceso del servidor, guardado con
+`st.cache_resource`) ejecuta cada trabajo en un hilo propio. La interfaz solo
+guarda el id del trabajo y consulta periódicamente sus resultados, que se van
+agregando a medida que termina cada documento.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from pipeline import Destino, Fuente, ejecutar
+
+# Una tarea recibe el trabajo (para consultar la cancelación) y genera resultados
+# con la forma de `pipeline.ejecutar`: {"doc", "origen", "nombre", "procesado", "error"}.
+# Si tiene un atributo `cerrar`, se llama al acabar el trabajo aunque se cancele antes
+# de empezar (suelta los PDF que la tarea retiene; ver `tarea_pipeline`).
+Tarea = Callable[["Trabajo"], Iterable[Dict[str, Any]]]
+
+
+def _cerrar(tarea: Tarea):
+    cerrar = getattr(tarea, "cerrar", None)
+    if cerrar is not None:
+        cerrar()
+
+
+class Trabajo:
+    """Estado de un trabajo: se lee desde la interfaz mientras el hilo lo actualiza."""
+
+    def __init__(self, descripcion: str, total: int):
+        self.id = uuid.uuid4().hex
+        self.descripcion = descripcion
+        self.total = total
+        self.estado = "en_cola"  # en_cola, en_curso, terminado, cancelado, error
+        self.error: Optional[str] = None
+        self.resultados: List[Dict[str, Any]] = []  # solo se agregan, en orden de llegada
+        self.creado = time.time()
+        self.finalizado: Optional[float] = None
+        self.cancelacion = threading.Event()
+
+    @property
+    def activo(self) -> bool:
+        return self.estado in ("en_cola", "en_curso")
+
+    def cancelar(self):
+        """Pide detener el trabajo; los documentos ya analizados se conservan."""
+        self.cancelacion.set()
+
+    def progreso(self) -> float:
+        return min(len(self.resultados) / self.total, 1.0) if self.total else 1.0
+
+
+class GestorTrabajos:
+    """Ejecuta trabajos en un pool de hilos y los conserva un tiempo después de terminar."""
+
+    def __init__(self, max_simultaneos: int = 2, retencion: float = 3600):
+        self._pool = ThreadPoolExecutor(max_workers=max_simultaneos, thread_name_prefix="trabajo")
+        self._trabajos: Dict[str, Trabajo] = {}
+        self._lock = threading.Lock()
+        self.retencion = retencion
+
+    def enviar(self, descripcion: str, total: int, tarea: Tarea) -> Trabajo:
+        """Encola `tarea` y devuelve enseguida el `Trabajo` que la representa."""
+        trabajo = Trabajo(descripcion, total)
+        with self._lock:
+            self._limpiar()
+            self._trabajos[trabajo.id] = trabajo
+        # con el contexto de quien lo envía, para que las métricas lleguen a su sesión
+        self._pool.submit(contextvars.copy_context().run, self._ejecutar, trabajo, tarea)
+        return trabajo
+
+    def obtener(self, id_trabajo: Optional[str]) -> Optional[Trabajo]:
+        with self._lock:
+            return self._trabajos.get(id_trabajo)
+
+    def _ejecutar(self, trabajo: Trabajo, tarea: Tarea):
+        if trabajo.cancelacion.is_set():
+            _cerrar(tarea)  # la tarea no llega a correr: suelto lo que retiene
+            trabajo.estado = "cancelado"
+            trabajo.finalizado = time.time()
+            return
+        trabajo.estado = "en_curso"
+        resultados = None
+        error = None
+        try:
+            resultados = iter(tarea(trabajo))
+            for resultado in resultados:
+                trabajo.resultados.append(resultado)
+                if trabajo.cancelacion.is_set():
+                    break
+        except Exception as e:
+            error = str(e)
+            print(f"Error en el trabajo {trabajo.descripcion}: {e}")
+        finally:
+            if resultados is not None and hasattr(resultados, "close"):
+                # libera el pool de procesos y las descargas en curso, y espera a los destinos
+                resultados.close()
+            _cerrar(tarea)
+            # el estado final va después de cerrar: mientras `activo` sea True los
+            # destinos (p. ej. la agenda) pueden seguir trabajando
+            if error is not None:
+                trabajo.error = error
+                trabajo.estado = "error"
+            else:
+                trabajo.estado = "cancelado" if trabajo.cancelacion.is_set() else "terminado"
+            trabajo.finalizado = time.time()
+
+    def _limpiar(self):
+        # descarto los trabajos terminados hace más de `retencion` segundos
+        limite = time.time() - self.retencion
+        for id_trabajo, trabajo in list(self._trabajos.items()):
+            if trabajo.finalizado is not None and trabajo.finalizado < limite:
+                del self._trabajos[id_trabajo]
+
+
+def tarea_pipeline(
+    fuente: Fuente,
+    motor: str = "reglas",
+    parada_temprana: bool = False,
+    destinos: Iterable[Destino] = (),
+) -> Tarea:
+    """Tarea que pasa los documentos de `fuente` por el flujo de `pipeline` con el motor elegido.
+
+    Para documentos subidos la fuente es `FuenteSubidos` (pares (nombre,
+    datos) preparados con un `Presupuesto`) y para Drive `FuenteDrive`. El
+    trabajo termina cuando los `destinos` (índice, agenda...) han cerrado.
+    """
+
+    def tarea(trabajo: Trabajo):
+        yield from ejecutar(
+            fuente,
+            motor=motor,
+            parada_temprana=parada_temprana,
+            destinos=destinos,
+            cancelar=trabajo.cancelacion,
+        )
+
+    tarea.cerrar = fuente.cerrar
+    return tarea
@@ -0,0 +1,199 @@
+"""Generador de un corpus sintético de memorandos institucionales en PDF.
+
+Los memos imitan a los reales: encabezado, destinatario, línea "Asunto:",
+una fecha límite ("hasta el 12 de marzo de 2026" o "hasta el 12/03/2026"),
+otras fechas que no son la límite y páginas de anexos de longitud variable.
+Los PDF se escriben a mano (texto Helvetica con WinAnsiEncoding), sin
+dependencias externas.
+
+Uso:
+    python benchmarks/corpus.py --cantidad 50 --salida corpus/
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import textwrap
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+MESES = [
+    "enero", "febrero", "marzo", "abril", "mayo", "junio", "julio",
+    "agosto", "septiembre", "octubre", "noviembre", "diciembre",
+]
+
+NOMBRES = ["Edwin", "María", "Carlos", "Lucía", "Jorge", "Paola", "Andrés", "Verónica"]
+APELLIDOS = ["Chasiquiza", "Toapanta", "Guamán", "Pérez", "Salazar", "Quishpe", "Molina", "Andrade"]
+TITULOS = ["Ing.", "Lic.", "Dr.", "MSc."]
+CARGOS = ["Jefe de laboratorio", "Jefe de departamento", "Docente", "Coordinador de carrera"]
+DEPARTAMENTOS = ["Sistemas de Información", "Electromecánica", "Agroindustria", "Investigación"]
+TEMAS = [
+    "Entrega de informes de gestión del periodo académico",
+    "Presentar planificación de prácticas de laboratorio",
+    "Actualización del inventario de equipos",
+    "Entrega de calificaciones del primer parcial",
+    "Revisión de sílabos y guías de práctica",
+    "Presentar el plan de mantenimiento preventivo",
+]
+RELLENO = (
+    "En cumplimiento de la normativa institucional vigente y con el fin de garantizar "
+    "la calidad de los procesos académicos y administrativos, se solicita a las unidades "
+    "involucradas coordinar las actividades correspondientes, verificar la documentación "
+    "de respaldo y reportar cualquier novedad a la dirección respectiva. "
+)
+
+LINEAS_POR_PAGINA = 48
+ANCHO_LINEA = 88
+
+
+def _fecha_larga(fecha: date) -> str:
+    return f"{fecha.day} de {MESES[fecha.month - 1]} de {fecha.year}"
+
+
+def _fecha_corta(fecha: date) -> str:
+    return f"{fecha.day:02d}/{fecha.month:02d}/{fecha.year}"
+
+
+def _persona(rng: random.Random) -> str:
+    return f"{rng.choice(TITULOS)} {rng.choice(NOMBRES)} {rng.choice(APELLIDOS)}, Mgtr."
+
+
+def generar_memo(rng: random.Random, numero: int) -> Tuple[List[str], Dict[str, str]]:
+    """Devuelve (líneas del memo, valores esperados) para un memo aleatorio."""
+    emision = date(2026, 1, 5) + timedelta(days=rng.randint(0, 300))
+    limite = emision + timedelta(days=rng.randint(3, 45))
+    reunion = emision + timedelta(days=rng.randint(1, 60))
+    asunto = rng.choice(TEMAS)
+    encargado = _persona(rng)
+    formato = rng.choice([_fecha_larga, _fecha_corta])
+
+    lineas = [
+        "UNIVERSIDAD TÉCNICA DE COTOPAXI",
+        f"MEMORANDO Nro. UTC-{emision.year}-{numero:04d}-M",
+        f"Latacunga, {_fecha_larga(emision)}",
+        "",
+        f"PARA: {encargado}",
+        rng.choice(CARGOS),
+        f"DE: {_persona(rng)}",
+        f"Director del departamento de {rng.choice(DEPARTAMENTOS)}",
+        "",
+        f"Asunto: {asunto}",
+        "",
+        "De mi consideración:",
+        "",
+    ]
+
+    parrafos = [RELLENO * rng.randint(1, 3) for _ in range(rng.randint(1, 4))]
+    parrafos.insert(
+        rng.randint(0, len(parrafos)),
+        f"Se convoca a reunión de seguimiento el {_fecha_larga(reunion)} en la sala de "
+        f"sesiones, según lo resuelto el {_fecha_corta(emision - timedelta(days=7))}.",
+    )
+    parrafos.append(
+        f"Por lo expuesto, se solicita {asunto.lower()} hasta el {formato(limite)}, "
+        "sin excepción, en el formato establecido."
+    )
+    if rng.random() < 0.5:
+        parrafos.append(f"Encargado: {encargado}")
+
+    for parrafo in parrafos:
+        lineas.extend(textwrap.wrap(parrafo, ANCHO_LINEA))
+        lineas.append("")
+    lineas += ["Atentamente,", "", _persona(rng)]
+
+    # anexos: tablas de fechas y texto que no aportan al análisis
+    for anexo in range(rng.choice([0, 0, 1, 2, 5, 12])):
+        lineas += ["", f"ANEXO {anexo + 1}"]
+        for fila in range(rng.randint(20, 60)):
+            dia = emision + timedelta(days=fila)
+            lineas.append(f"{fila + 1:3d}  {_fecha_corta(dia)}  Registro de actividad {rng.randint(100, 999)}")
+        lineas.extend(textwrap.wrap(RELLENO * rng.randint(2, 8), ANCHO_LINEA))
+
+    esperado = {
+        "asunto": asunto,
+        "fecha_limite": limite.isoformat(),
+        "encargado": encargado,
+    }
+    return lineas, esperado
+
+
+def _escapar(texto: str) -> bytes:
+    texto = texto.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return texto.encode("cp1252", errors="replace")
+
+
+def escribir_pdf(lineas: List[str]) -> bytes:
+    """Arma un PDF mínimo con las líneas repartidas en páginas A4."""
+    paginas = [
+        lineas[i:i + LINEAS_POR_PAGINA] for i in range(0, len(lineas), LINEAS_POR_PAGINA)
+    ] or [[]]
+
+    # 1: catálogo, 2: árbol de páginas, 3: fuente; luego (página, contenido) por página
+    objetos = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    }
+    hijos = []
+    for indice, pagina in enumerate(paginas):
+        num_pagina, num_contenido = 4 + 2 * indice, 5 + 2 * indice
+        hijos.append(f"{num_pagina} 0 R".encode())
+        flujo = b"BT /F1 10 Tf 14 TL 56 790 Td\n" + b"".join(
+            b"(" + _escapar(linea) + b") Tj T*\n" for linea in pagina
+        ) + b"ET"
+        objetos[num_pagina] = (
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents "
+            + f"{num_contenido} 0 R".encode() + b" >>"
+        )
+        objetos[num_contenido] = (
+            f"<< /Length {len(flujo)} >>\nstream\n".encode() + flujo + b"\nendstream"
+        )
+    objetos[2] = (
+        b"<< /Type /Pages /Kids [" + b" ".join(hijos) + b"] /Count "
+        + str(len(paginas)).encode() + b" >>"
+    )
+
+    salida = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    posiciones = []
+    for numero in range(1, len(objetos) + 1):
+        posiciones.append(len(salida))
+        salida += f"{numero} 0 obj\n".encode() + objetos[numero] + b"\nendobj\n"
+
+    inicio_xref = len(salida)
+    salida += f"xref\n0 {len(objetos) + 1}\n0000000000 65535 f \n".encode()
+    salida += b"".join(f"{pos:010d} 00000 n \n".encode() for pos in posiciones)
+    salida += (
+        f"trailer\n<< /Size {len(objetos) + 1} /Root 1 0 R >>\n"
+        f"startxref\n{inicio_xref}\n%%EOF\n"
+    ).encode()
+    return bytes(salida)
+
+
+def iterar_corpus(cantidad: int, semilla: int = 0) -> Iterator[Tuple[str, bytes, Dict[str, str]]]:
+    """Genera (nombre, bytes del PDF, esperado) de forma determinista para la semilla."""
+    rng = random.Random(semilla)
+    for numero in range(1, cantidad + 1):
+        lineas, esperado = generar_memo(rng, numero)
+        yield f"memo_{numero:04d}.pdf", escribir_pdf(lineas), esperado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cantidad", type=int, default=50)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", type=Path, default=Path("corpus"))
+    args = parser.parse_args()
+
+    args.salida.mkdir(parents=True, exist_ok=True)
+    with open(args.salida / "esperado.jsonl", "w", encoding="utf-8") as manifiesto:
+        for nombre, datos, esperado in iterar_corpus(args.cantidad, args.semilla):
+            (args.salida / nombre).write_bytes(datos)
+            manifiesto.write(json.dumps({"archivo": nombre, **esperado}, ensure_ascii=False) + "\n")
+    print(f"{args.cantidad} memos escritos en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
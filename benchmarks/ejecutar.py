@@ -0,0 +1,225 @@
+"""Benchmarks de extracción y análisis sobre el corpus sintético de `corpus.py`.
+
+Mide `extraer_texto_pdf` (completa y con parada temprana), cada función de
+`analyzer`, `extraer_entidades_ia` (si el modelo de spaCy está instalado) y el
+flujo completo (`procesar_pdf` con caché fría y caliente, y `analizar_lote`)
+para varios tamaños de corpus. Por cada medida informa docs/s, latencia p50/p95
+en milisegundos y el pico de memoria (RSS) del proceso hasta ese momento.
+
+Los resultados se guardan en JSON; con `--comparar` se contrastan con una
+ejecución anterior y el comando termina con código 1 si algún p95 empeora más
+que la tolerancia.
+
+Uso:
+    python benchmarks/ejecutar.py --tamanos 10 100 --salida resultados.json
+    python benchmarks/ejecutar.py --comparar base.json --tolerancia 0.2
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from io import BytesIO
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ / "app"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+# caché propia de la ejecución; va por entorno para que la vean también los procesos del lote
+_CARPETA_CACHE = tempfile.TemporaryDirectory(prefix="gestor-bench-")
+os.environ["GESTOR_CACHE_DB"] = os.path.join(_CARPETA_CACHE.name, "cache.sqlite3")
+
+import analyzer  # noqa: E402
+import cache_documentos  # noqa: E402
+from corpus import iterar_corpus  # noqa: E402
+from lote import analizar_lote  # noqa: E402
+from pdf_reader import extraer_texto_pdf  # noqa: E402
+from procesamiento import procesar_pdf  # noqa: E402
+
+# funciones del analizador que reciben solo el texto
+FUNCIONES_ANALIZADOR = [
+    "escanear_texto",
+    "buscar_palabras_clave",
+    "buscar_fecha",
+    "candidatos_fecha_limite",
+    "buscar_fecha_limite_doc",
+    "buscar_asunto",
+    "detectar_accion",
+    "buscar_encargado",
+    "analizar_documento",
+]
+
+
+def _percentil(valores: List[float], p: float) -> float:
+    ordenados = sorted(valores)
+    indice = min(int(round(p / 100 * (len(ordenados) - 1))), len(ordenados) - 1)
+    return ordenados[indice]
+
+
+def _rss_pico_mb(quien=resource.RUSAGE_SELF) -> float:
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    pico = resource.getrusage(quien).ru_maxrss
+    return pico / (1024 * 1024) if sys.platform == "darwin" else pico / 1024
+
+
+def _resumen(latencias: List[float], total: float) -> Dict[str, float]:
+    return {
+        "docs": len(latencias),
+        "docs_por_segundo": round(len(latencias) / total, 2) if total else None,
+        "p50_ms": round(_percentil(latencias, 50) * 1000, 3),
+        "p95_ms": round(_percentil(latencias, 95) * 1000, 3),
+        "rss_pico_mb": round(_rss_pico_mb(), 1),
+    }
+
+
+def medir(funcion: Callable[[Any], Any], entradas: List[Any], antes=None) -> Dict[str, float]:
+    """Llama a `funcion` con cada entrada y resume las latencias (`antes` se ejecuta sin medir)."""
+    latencias = []
+    inicio_total = time.perf_counter()
+    for entrada in entradas:
+        if antes is not None:
+            antes()
+        inicio = time.perf_counter()
+        funcion(entrada)
+        latencias.append(time.perf_counter() - inicio)
+    return _resumen(latencias, time.perf_counter() - inicio_total)
+
+
+def _sin_memoizar():
+    # las funciones del analizador comparten un escaneo memoizado: lo vacío para medir en frío
+    analyzer.escanear_texto.cache_clear()
+
+
+def medir_tamano(cantidad: int, semilla: int, workers: int) -> Dict[str, Any]:
+    pdfs = [datos for _, datos, _ in iterar_corpus(cantidad, semilla)]
+    textos = [extraer_texto_pdf(BytesIO(datos)) for datos in pdfs]
+    resultados: Dict[str, Any] = {
+        "bytes_pdf_promedio": sum(map(len, pdfs)) // len(pdfs),
+        "caracteres_promedio": sum(map(len, textos)) // len(textos),
+    }
+
+    resultados["extraer_texto_pdf"] = medir(lambda d: extraer_texto_pdf(BytesIO(d)), pdfs)
+    resultados["extraer_texto_pdf_rapida"] = medir(
+        lambda d: extraer_texto_pdf(BytesIO(d), parada_temprana=True), pdfs
+    )
+
+    for nombre in FUNCIONES_ANALIZADOR:
+        resultados[f"analyzer.{nombre}"] = medir(
+            getattr(analyzer, nombre), textos, antes=_sin_memoizar
+        )
+
+    resultados.update(_medir_ia(textos))
+
+    # flujo completo partiendo de la caché vacía
+    cache_documentos.limpiar_cache()
+    resultados["procesar_pdf_frio"] = medir(procesar_pdf, pdfs, antes=_sin_memoizar)
+    resultados["procesar_pdf_caliente"] = medir(procesar_pdf, pdfs)
+
+    cache_documentos.limpiar_cache()
+    inicio = time.perf_counter()
+    latencias = []
+    for _ in analizar_lote(enumerate(pdfs), workers=workers):
+        # en el lote la latencia es el tiempo desde el inicio hasta cada resultado
+        latencias.append(time.perf_counter() - inicio)
+    resumen = _resumen(latencias, time.perf_counter() - inicio)
+    resumen["workers"] = workers
+    resumen["rss_pico_hijos_mb"] = round(_rss_pico_mb(resource.RUSAGE_CHILDREN), 1)
+    resultados["analizar_lote"] = resumen
+
+    return resultados
+
+
+def _medir_ia(textos: List[str]) -> Dict[str, Any]:
+    try:
+        from ai_extractor import extraer_entidades_ia, precargar_modelo
+    except ImportError as e:
+        return {"extraer_entidades_ia": {"omitido": str(e)}}
+    if not precargar_modelo():  # la carga del modelo no cuenta como latencia
+        return {"extraer_entidades_ia": {"omitido": "modelo es_core_news_sm no instalado"}}
+    return {
+        "extraer_entidades_ia": medir(extraer_entidades_ia, textos, antes=_sin_memoizar),
+        "extraer_entidades_ia_completo": medir(
+            lambda t: extraer_entidades_ia(t, por_ventanas=False), textos
+        ),
+    }
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=RAIZ, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(actual: Dict[str, Any], base: Dict[str, Any], tolerancia: float) -> List[str]:
+    """Devuelve las medidas cuyo p95 empeoró más de `tolerancia` (0.2 = 20 %) respecto a `base`."""
+    regresiones = []
+    for tamano, medidas in actual["resultados"].items():
+        medidas_base = base.get("resultados", {}).get(tamano, {})
+        for nombre, medida in medidas.items():
+            anterior = medidas_base.get(nombre)
+            if not isinstance(medida, dict) or not isinstance(anterior, dict):
+                continue
+            if "p95_ms" not in medida or not anterior.get("p95_ms"):
+                continue
+            cambio = medida["p95_ms"] / anterior["p95_ms"] - 1
+            if cambio > tolerancia:
+                regresiones.append(
+                    f"{tamano} docs / {nombre}: p95 {anterior['p95_ms']} ms -> "
+                    f"{medida['p95_ms']} ms (+{cambio:.0%})"
+                )
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--salida", type=Path, default=None)
+    parser.add_argument("--comparar", type=Path, default=None, help="JSON de una ejecución anterior")
+    parser.add_argument("--tolerancia", type=float, default=0.2)
+    args = parser.parse_args()
+
+    reporte = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "semilla": args.semilla,
+        "resultados": {},
+    }
+    for cantidad in args.tamanos:
+        print(f"Midiendo corpus de {cantidad} documentos...", file=sys.stderr)
+        reporte["resultados"][str(cantidad)] = medir_tamano(cantidad, args.semilla, args.workers)
+
+    salida = args.salida or RAIZ / "benchmarks" / "resultados" / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    salida.parent.mkdir(parents=True, exist_ok=True)
+    salida.write_text(json.dumps(reporte, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"Resultados guardados en {salida}", file=sys.stderr)
+
+    if args.comparar:
+        base = json.loads(args.comparar.read_text(encoding="utf-8"))
+        regresiones = comparar(reporte, base, args.tolerancia)
+        for linea in regresiones:
+            print(f"REGRESIÓN {linea}", file=sys.stderr)
+        if regresiones:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Prueba de estrés de las expresiones regulares del analizador.
+
+Alimenta `analizar_documento` con textos adversos de ~1 MB (bloques enormes de
+espacios, listas de nombres sin "(encargado)", "asunto" sin dos puntos, dígitos
+seguidos de espacios...), tanto por el escaneo normal como por el respaldo con
+regex que se usa cuando `lower()` cambia la longitud del texto. Cada caso debe
+terminar en menos de `--limite` segundos.
+
+Es un comando y no una prueba de pytest (el proyecto no tiene suite de
+pruebas): cada caso corre en un proceso aparte para poder cortarlo si se
+cuelga, y los tiempos dependen de la máquina. Sirve como control en CI:
+termina con código 0 si todos los casos pasan y con 1 si alguno supera el
+límite o no termina, indicando cuáles.
+
+Uso:
+    python benchmarks/estres_regex.py
+    python benchmarks/estres_regex.py --tamano 2000000 --limite 1.5
+"""
+
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ / "app"))
+
+# un carácter cuya minúscula ocupa dos: obliga al analizador a usar el respaldo con regex
+_FUERZA_RESPALDO = "İ"
+
+
+def _repetir(unidad: str, tamano: int) -> str:
+    return unidad * (tamano // len(unidad) + 1)
+
+
+def _palabras(tamano: int) -> str:
+    # nombres y palabras sueltas: lo que hacía retroceder a "Nombre (encargado)"
+    rng = random.Random(0)
+    vocabulario = ["Jefe", "de", "departamento", "Juan", "Pérez,", "docente", "Mgtr.", "laboratorio"]
+    return " ".join(rng.choice(vocabulario) for _ in range(tamano // 6))
+
+
+CASOS: Dict[str, Callable[[int], str]] = {
+    "saltos_de_linea": lambda n: "\n" * n,
+    "espacios_mezclados": lambda n: _repetir(" \n\t", n),
+    "palabras_sin_encargado": _palabras,
+    "jefe_sin_parentesis": lambda n: _repetir("jefe de laboratorio ", n),
+    "digitos_y_espacios": lambda n: _repetir("1 ", n),
+    "digitos_con_espacios_largos": lambda n: _repetir("12" + " " * 5000, n),
+    "fechas_a_medias": lambda n: _repetir("hasta 12/03/ 12 de mar ", n),
+    "asunto_sin_dos_puntos": lambda n: _repetir("asunto ", n),
+    "asunto_en_lineas": lambda n: _repetir("\n asunto" + " " * 100, n),
+    "fecha_limite_incompleta": lambda n: _repetir("fecha ", n),
+}
+# los mismos textos por el camino de respaldo (regex sobre el texto original)
+CASOS.update({
+    f"respaldo_{nombre}": (lambda generar: lambda n: _FUERZA_RESPALDO + generar(n))(generar)
+    for nombre, generar in list(CASOS.items())
+})
+
+
+def _ejecutar(nombre: str, tamano: int, cola):
+    from analyzer import analizar_documento
+
+    texto = CASOS[nombre](tamano)[:tamano]
+    inicio = time.perf_counter()
+    resultado = analizar_documento(texto)
+    cola.put((time.perf_counter() - inicio, resultado["incompleto"]))
+
+
+def medir_caso(nombre: str, tamano: int, limite: float):
+    """Devuelve (segundos, incompleto) o None si el caso no terminó en el doble del límite."""
+    contexto = multiprocessing.get_context("spawn")
+    cola = contexto.Queue()
+    proceso = contexto.Process(target=_ejecutar, args=(nombre, tamano, cola))
+    proceso.start()
+    proceso.join(limite * 2 + 5)  # margen para arrancar el intérprete
+    if proceso.is_alive():
+        proceso.terminate()
+        proceso.join()
+        return None
+    return cola.get() if not cola.empty() else None
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tamano", type=int, default=1_000_000, help="caracteres por texto")
+    parser.add_argument("--limite", type=float, default=1.0, help="segundos máximos por caso")
+    parser.add_argument("--casos", nargs="+", choices=sorted(CASOS), default=sorted(CASOS))
+    args = parser.parse_args(argv)
+
+    fallidos = []
+    for nombre in args.casos:
+        medida = medir_caso(nombre, args.tamano, args.limite)
+        if medida is None:
+            fallidos.append(nombre)
+            print(f"{nombre:45s} NO TERMINÓ", file=sys.stderr)
+            continue
+        segundos, incompleto = medida
+        nota = " (cortado por presupuesto)" if incompleto else ""
+        print(f"{nombre:45s} {segundos:7.3f} s{nota}", file=sys.stderr)
+        if segundos > args.limite:
+            fallidos.append(nombre)
+
+    if fallidos:
+        print(f"Superan {args.limite} s: {', '.join(fallidos)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())